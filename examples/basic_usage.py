@@ -1,19 +1,41 @@
 #!/usr/bin/env python
 """Example script demonstrating basic usage of SyntopicalChat."""
 
+import itertools
 import os
 from pathlib import Path
+from typing import Dict, Iterable, Iterator
+
+from rich.progress import track
 
-from syntopicalchat.pdf_processor.processor import PDFProcessor
-from syntopicalchat.vector_db.storage import VectorDBStorage
 from syntopicalchat.llm.chat import SyntopicalChat
+from syntopicalchat.pdf_processor.processor import (
+    PDFProcessor,
+    iter_pdf_paths,
+    pdf_sha256,
+)
+from syntopicalchat.vector_db.storage import VectorDBStorage
+
+
+def iter_new_pdfs(
+    pdf_files: Iterable[Path], vector_db: VectorDBStorage, digests: Dict[Path, str]
+) -> Iterator[Path]:
+    """Yield the PDFs not yet in the database, recording each one's digest."""
+    seen = set()
+    for pdf_file in pdf_files:
+        sha256 = pdf_sha256(pdf_file)
+        if sha256 in seen or vector_db.has_document(sha256):
+            continue
+        seen.add(sha256)
+        digests[pdf_file] = sha256
+        yield pdf_file
 
 
 def main():
     """Run a basic example of SyntopicalChat."""
     print("SyntopicalChat Basic Usage Example")
     print("==================================")
-    
+
     # Check if PDF files are provided
     pdf_dir = Path("examples/pdfs")
     if not pdf_dir.exists():
@@ -21,62 +43,88 @@ def main():
         pdf_dir.mkdir(parents=True, exist_ok=True)
         print(f"Please place some PDF files in {pdf_dir} and run this script again.")
         return
-    
-    pdf_files = list(pdf_dir.glob("*.pdf"))
-    if not pdf_files:
-        print(f"No PDF files found in {pdf_dir}. Please add some PDF files and try again.")
+
+    # Find PDFs lazily so that parsing overlaps with scanning the folder
+    pdf_files = iter_pdf_paths(pdf_dir)
+    first_pdf = next(pdf_files, None)
+    if first_pdf is None:
+        print(
+            f"No PDF files found in {pdf_dir}. Please add some PDF files and try again."
+        )
         return
-    
-    print(f"Found {len(pdf_files)} PDF files.")
-    
+    pdf_files = itertools.chain([first_pdf], pdf_files)
+
     # Initialize components
     pdf_processor = PDFProcessor()
-    vector_db = VectorDBStorage(persist_directory="examples/data/chroma_db")
-    
-    # Process PDFs
-    print("\nProcessing PDFs:")
-    for pdf_file in pdf_files:
-        print(f"  - {pdf_file.name}")
-        paper_content = pdf_processor.process_pdf(pdf_file)
-        vector_db.add_paper(paper_content)
-        print(f"    Title: {paper_content.metadata.title}")
-        print(f"    Authors: {', '.join(paper_content.metadata.authors)}")
-        if paper_content.metadata.abstract:
-            abstract = paper_content.metadata.abstract
-            print(f"    Abstract: {abstract[:100]}..." if len(abstract) > 100 else abstract)
-    
-    # List all papers
-    papers = vector_db.get_all_papers()
-    print(f"\nStored {len(papers)} papers in the vector database.")
-    
-    # Check if OpenAI API key is set for chat functionality
-    if not os.environ.get("OPENAI_API_KEY"):
-        print("\nNote: OPENAI_API_KEY environment variable is not set.")
-        print("To use the chat functionality, please set this environment variable:")
-        print("  export OPENAI_API_KEY=your_api_key_here")
-        return
-    
-    # Initialize chat
-    chat = SyntopicalChat(vector_db=vector_db)
-    
-    # Example queries
-    example_queries = [
-        "What are the main topics covered in these papers?",
-        "Compare the methodologies used in these papers.",
-        "What are the key findings across these papers?",
-    ]
-    
-    print("\nExample Queries:")
-    for i, query in enumerate(example_queries, 1):
-        print(f"\n{i}. {query}")
-        response = chat.chat(query)
-        print(f"\nResponse: {response['answer'][:200]}...")
-        print("\nSources:")
-        for j, doc in enumerate(response["source_documents"][:2], 1):
-            print(f"  {j}. {doc.metadata.get('title', 'Unknown')}")
-    
-    print("\nExample complete!")
+    # Close the database on exit so that pending writes reach disk
+    with VectorDBStorage(persist_directory="examples/data/chroma_db") as vector_db:
+        # Skip PDFs that were already added on a previous run or are repeated
+        # in the folder, keeping their digests so they are not hashed again
+        digests: Dict[Path, str] = {}
+        new_pdf_files = iter_new_pdfs(pdf_files, vector_db, digests)
+
+        # Process PDFs, collecting results so nothing is printed per file
+        processed = []
+        errors = []
+        results = pdf_processor.process_pdfs(new_pdf_files, digests=digests)
+        for pdf_file, paper_content in track(results, description="Processing PDFs..."):
+            if isinstance(paper_content, Exception):
+                errors.append((pdf_file, paper_content))
+            else:
+                processed.append(paper_content)
+
+        # Summarize the batch once processing is complete
+        print("\nProcessed PDFs:")
+        for paper_content in processed:
+            metadata = paper_content.metadata
+            print(f"  - {metadata.source_file.name}")
+            print(f"    Title: {metadata.title}")
+            print(f"    Authors: {', '.join(metadata.authors)}")
+            if metadata.abstract:
+                snippet = metadata.abstract[:100]
+                ellipsis = "..." if len(snippet) < len(metadata.abstract) else ""
+                print(f"    Abstract: {snippet}{ellipsis}")
+        for pdf_file, error in errors:
+            print(f"  - {pdf_file.name}")
+            print(f"    Error: {error}")
+
+        # Add all papers to the vector database at once
+        vector_db.add_papers(processed)
+
+        # List all papers
+        papers = vector_db.get_all_papers()
+        print(f"\nStored {len(papers)} papers in the vector database.")
+
+        # Check if OpenAI API key is set for chat functionality
+        if not os.environ.get("OPENAI_API_KEY"):
+            print("\nNote: OPENAI_API_KEY environment variable is not set.")
+            print(
+                "To use the chat functionality, please set this environment variable:"
+            )
+            print("  export OPENAI_API_KEY=your_api_key_here")
+            return
+
+        # Initialize chat
+        chat = SyntopicalChat(vector_db=vector_db)
+
+        # Example queries
+        example_queries = [
+            "What are the main topics covered in these papers?",
+            "Compare the methodologies used in these papers.",
+            "What are the key findings across these papers?",
+        ]
+
+        print("\nExample Queries:")
+        for i, query in enumerate(example_queries, 1):
+            print(f"\n{i}. {query}")
+            response = chat.chat(query)
+            print(f"\nResponse: {response['answer'][:200]}...")
+            print("\nSources:")
+            for j, doc in enumerate(response["source_documents"][:2], 1):
+                print(f"  {j}. {doc.metadata.get('title', 'Unknown')}")
+
+        print("\nExample complete!")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
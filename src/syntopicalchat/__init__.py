@@ -1,3 +1,3 @@
 """SyntopicalChat - A CLI application for syntopical analysis of academic papers using LLMs."""
 
-__version__ = "0.1.0"
\ No newline at end of file
+__version__ = "0.1.0"
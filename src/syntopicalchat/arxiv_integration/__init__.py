@@ -1 +1 @@
-"""Arxiv integration module for searching and downloading papers from Arxiv."""
\ No newline at end of file
+"""Arxiv integration module for searching and downloading papers from Arxiv."""
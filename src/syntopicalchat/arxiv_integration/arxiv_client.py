@@ -1,12 +1,21 @@
 """Arxiv client for searching and downloading papers from Arxiv."""
 
-import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import arxiv
-import requests
+import httpx
+
+# Maximum number of papers downloaded concurrently
+MAX_DOWNLOAD_WORKERS = 8
+
+# Size of the chunks written to disk while downloading a paper
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Largest page requested from the Arxiv API (the arxiv client's default)
+MAX_PAGE_SIZE = 100
 
 
 class ArxivClient:
@@ -22,6 +31,22 @@ class ArxivClient:
         self.download_dir = download_dir or Path(tempfile.mkdtemp())
         self.download_dir.mkdir(parents=True, exist_ok=True)
 
+        # Shared HTTP/2 client, so concurrent downloads are multiplexed over a
+        # single connection instead of each paying for its own TLS handshake
+        self.http_client = httpx.Client(http2=True, timeout=60.0, follow_redirects=True)
+
+    def close(self) -> None:
+        """Close the HTTP connections to Arxiv."""
+        self.http_client.close()
+
+    def __enter__(self) -> "ArxivClient":
+        """Use the client as a context manager that closes it on exit."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Close the client when leaving the context."""
+        self.close()
+
     def search(self, query: str, max_results: int = 5) -> List[Dict]:
         """
         Search Arxiv for papers matching the query.
@@ -33,16 +58,33 @@ class ArxivClient:
         Returns:
             List of paper metadata.
         """
-        client = arxiv.Client()
+        return list(self._iter_results(query, max_results))
+
+    def _iter_results(self, query: str, max_results: int) -> Iterator[Dict]:
+        """
+        Lazily search Arxiv, yielding each result as soon as it is fetched.
+
+        Args:
+            query: Query string to search for.
+            max_results: Maximum number of results to return.
+
+        Yields:
+            Paper metadata.
+        """
+        # Request only as many results per page as needed, so small searches
+        # are served by a single small API response
+        client = arxiv.Client(
+            page_size=max(1, min(max_results, MAX_PAGE_SIZE)),
+            delay_seconds=3,
+        )
         search = arxiv.Search(
             query=query,
             max_results=max_results,
             sort_by=arxiv.SortCriterion.Relevance,
         )
 
-        results = []
         for result in client.results(search):
-            paper_info = {
+            yield {
                 "title": result.title,
                 "authors": [author.name for author in result.authors],
                 "summary": result.summary,
@@ -52,9 +94,6 @@ class ArxivClient:
                 "arxiv_id": result.get_short_id(),
                 "categories": result.categories,
             }
-            results.append(paper_info)
-
-        return results
 
     def download_paper(self, paper_info: Dict) -> Path:
         """
@@ -68,23 +107,25 @@ class ArxivClient:
         """
         arxiv_id = paper_info["arxiv_id"]
         pdf_url = paper_info["pdf_url"]
-        
+
         # Create a sanitized filename
         filename = f"{arxiv_id}.pdf"
         file_path = self.download_dir / filename
-        
+
         # Download the PDF if it doesn't exist
         if not file_path.exists():
-            response = requests.get(pdf_url, stream=True)
-            response.raise_for_status()
-            
-            with open(file_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        
+            with self.http_client.stream("GET", pdf_url) as response:
+                response.raise_for_status()
+
+                with open(file_path, "wb") as f:
+                    for chunk in response.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
         return file_path
 
-    def search_and_download(self, query: str, max_results: int = 5) -> List[Tuple[Dict, Path]]:
+    def search_and_download(
+        self, query: str, max_results: int = 5
+    ) -> List[Tuple[Dict, Path]]:
         """
         Search Arxiv and download matching papers.
 
@@ -95,14 +136,23 @@ class ArxivClient:
         Returns:
             List of tuples containing paper metadata and path to downloaded PDF.
         """
-        papers = self.search(query, max_results)
         results = []
-        
-        for paper in papers:
-            try:
-                pdf_path = self.download_paper(paper)
-                results.append((paper, pdf_path))
-            except Exception as e:
-                print(f"Error downloading {paper['title']}: {str(e)}")
-        
-        return results
\ No newline at end of file
+
+        # Downloads are network bound, so overlap them in a thread pool, and
+        # start each one as soon as its search result arrives rather than
+        # waiting for the search to finish
+        max_workers = max(1, min(MAX_DOWNLOAD_WORKERS, max_results))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            downloads = [
+                (paper, executor.submit(self.download_paper, paper))
+                for paper in self._iter_results(query, max_results)
+            ]
+
+            # Collect in search order so results keep their relevance ranking
+            for paper, future in downloads:
+                try:
+                    results.append((paper, future.result()))
+                except Exception as e:
+                    print(f"Error downloading {paper['title']}: {str(e)}")
+
+        return results
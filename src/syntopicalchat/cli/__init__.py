@@ -1 +1 @@
-"""CLI interface module for the SyntopicalChat application."""
\ No newline at end of file
+"""CLI interface module for the SyntopicalChat application."""
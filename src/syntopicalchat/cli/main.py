@@ -1,21 +1,27 @@
 """Main CLI entry point for the SyntopicalChat application."""
 
-import os
+import functools
 import glob
+import itertools
+import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import typer
 from rich.console import Console
-from rich.panel import Panel
 from rich.markdown import Markdown
+from rich.panel import Panel
+from rich.prompt import Confirm, IntPrompt, Prompt
 from rich.table import Table
-from rich.prompt import Prompt, Confirm, IntPrompt
 
-from syntopicalchat.pdf_processor.processor import PDFProcessor
-from syntopicalchat.vector_db.storage import VectorDBStorage
-from syntopicalchat.llm.chat import SyntopicalChat
 from syntopicalchat.arxiv_integration.arxiv_client import ArxivClient
+from syntopicalchat.llm.chat import SyntopicalChat
+from syntopicalchat.pdf_processor.processor import (
+    PDFProcessor,
+    iter_pdf_paths,
+    pdf_sha256,
+)
+from syntopicalchat.vector_db.storage import VectorDBStorage
 
 # Create Typer app
 app = typer.Typer(
@@ -34,6 +40,131 @@ def callback():
     pass
 
 
+@functools.lru_cache(maxsize=4)
+def _get_vector_db(db_path: str, embedding_backend: str = "fp32") -> VectorDBStorage:
+    """
+    Get the vector database for a path, reusing an already loaded instance.
+
+    Args:
+        db_path: Path to the vector database.
+        embedding_backend: Embedding model backend.
+
+    Returns:
+        Vector database storage.
+    """
+    return VectorDBStorage(
+        persist_directory=db_path, embedding_backend=embedding_backend
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _get_chat(
+    db_path: str, model: str, embedding_backend: str = "fp32"
+) -> SyntopicalChat:
+    """
+    Get the chat interface for a database and model, reusing an existing one.
+
+    Args:
+        db_path: Path to the vector database.
+        model: OpenAI model to use.
+        embedding_backend: Embedding model backend.
+
+    Returns:
+        Chat interface.
+    """
+    return SyntopicalChat(
+        vector_db=_get_vector_db(db_path, embedding_backend), model_name=model
+    )
+
+
+def _iter_new_pdfs(
+    pdf_paths: Iterable[Path], vector_db: VectorDBStorage, digests: Dict[Path, str]
+) -> Iterator[Path]:
+    """
+    Yield the PDF files that are not yet in the vector database.
+
+    Files already in the database, or repeated within pdf_paths, are skipped.
+
+    Args:
+        pdf_paths: Paths to the PDF files.
+        vector_db: Vector database to check against.
+        digests: Dictionary that the SHA-256 digest of each yielded file is
+            added to before it is yielded, so it is not hashed again.
+
+    Yields:
+        Paths to the PDF files that still need processing.
+    """
+    seen = set()
+
+    for pdf_path in pdf_paths:
+        try:
+            sha256 = pdf_sha256(pdf_path)
+        except OSError as e:
+            console.print(f"❌ Error processing {pdf_path}: {str(e)}", style="bold red")
+            continue
+
+        if sha256 in seen or vector_db.has_document(sha256):
+            console.print(
+                f"⏭️  Skipping [bold]{pdf_path}[/bold] (already in the database)"
+            )
+            continue
+
+        seen.add(sha256)
+        digests[pdf_path] = sha256
+        yield pdf_path
+
+
+def _ingest_pdfs(
+    pdf_paths: Iterable[Path],
+    pdf_processor: PDFProcessor,
+    vector_db: VectorDBStorage,
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Process PDF files and add them to the vector database.
+
+    Files already in the database are skipped. Parsing is spread across worker
+    processes; the parsed papers are then added to the vector database from
+    this process in a single batch.
+
+    Args:
+        pdf_paths: Paths to the PDF files; may be a lazy iterator.
+        pdf_processor: PDF processor to use.
+        vector_db: Vector database to add the papers to.
+        workers: Number of worker processes to parse PDFs with.
+    """
+    papers = []
+    digests: Dict[Path, str] = {}
+    new_pdf_paths = _iter_new_pdfs(pdf_paths, vector_db, digests)
+
+    for pdf_path, result in pdf_processor.process_pdfs(
+        new_pdf_paths, max_workers=workers, digests=digests
+    ):
+        console.print(f"Processing [bold]{pdf_path}[/bold]...")
+
+        if isinstance(result, Exception):
+            console.print(
+                f"❌ Error processing {pdf_path}: {str(result)}", style="bold red"
+            )
+            continue
+
+        papers.append(result)
+        console.print(f"✅ Successfully processed [bold]{result.metadata.title}[/bold]")
+
+    if not papers:
+        return
+
+    try:
+        # Add all papers to the vector database at once
+        vector_db.add_papers(papers)
+        vector_db.flush()
+    except Exception as e:
+        console.print(
+            f"❌ Error adding papers to the vector database: {str(e)}",
+            style="bold red",
+        )
+
+
 @app.command()
 def upload(
     pdf_paths: List[Path] = typer.Argument(
@@ -42,6 +173,15 @@ def upload(
     db_path: Path = typer.Option(
         "data/chroma_db", "--db-path", "-d", help="Path to the vector database"
     ),
+    workers: Optional[int] = typer.Option(
+        None, "--workers", "-w", help="Number of processes used to parse PDFs"
+    ),
+    embedding_backend: str = typer.Option(
+        "fp32",
+        "--embedding-backend",
+        "-e",
+        help="Embedding model backend (fp32 or onnx-int8)",
+    ),
 ):
     """Upload PDF files to the system."""
     console.print(Panel("Uploading PDF files...", title="SyntopicalChat"))
@@ -50,23 +190,10 @@ def upload(
     pdf_processor = PDFProcessor()
 
     # Initialize vector database
-    vector_db = VectorDBStorage(persist_directory=db_path)
-
-    # Process each PDF file
-    for pdf_path in pdf_paths:
-        try:
-            console.print(f"Processing [bold]{pdf_path}[/bold]...")
-
-            # Process PDF
-            paper_content = pdf_processor.process_pdf(pdf_path)
+    vector_db = _get_vector_db(str(db_path), embedding_backend)
 
-            # Add to vector database
-            vector_db.add_paper(paper_content)
-
-            console.print(f"✅ Successfully processed [bold]{paper_content.metadata.title}[/bold]")
-
-        except Exception as e:
-            console.print(f"❌ Error processing {pdf_path}: {str(e)}", style="bold red")
+    # Process the PDF files
+    _ingest_pdfs(pdf_paths, pdf_processor, vector_db, workers)
 
     console.print(Panel("Upload complete!", title="SyntopicalChat"))
 
@@ -81,7 +208,7 @@ def list(
     console.print(Panel("Listing uploaded papers...", title="SyntopicalChat"))
 
     # Initialize vector database
-    vector_db = VectorDBStorage(persist_directory=db_path)
+    vector_db = _get_vector_db(str(db_path))
 
     # Get all papers
     papers = vector_db.get_all_papers()
@@ -115,6 +242,12 @@ def chat(
     model: str = typer.Option(
         "gpt-3.5-turbo", "--model", "-m", help="OpenAI model to use"
     ),
+    embedding_backend: str = typer.Option(
+        "fp32",
+        "--embedding-backend",
+        "-e",
+        help="Embedding model backend (fp32 or onnx-int8)",
+    ),
 ):
     """Start a chat session about the uploaded papers."""
     # Check if OpenAI API key is set
@@ -126,17 +259,17 @@ def chat(
         )
         return
 
-    console.print(Panel(
-        "Welcome to SyntopicalChat! You can now ask questions about the papers you've uploaded.\n"
-        "Type 'exit' or 'quit' to end the session.",
-        title="SyntopicalChat"
-    ))
-
-    # Initialize vector database
-    vector_db = VectorDBStorage(persist_directory=db_path)
+    console.print(
+        Panel(
+            "Welcome to SyntopicalChat! You can now ask questions about the "
+            "papers you've uploaded.\n"
+            "Type 'exit' or 'quit' to end the session.",
+            title="SyntopicalChat",
+        )
+    )
 
-    # Initialize chat
-    chat = SyntopicalChat(vector_db=vector_db, model_name=model)
+    # Initialize chat, reusing an already loaded vector database
+    chat = _get_chat(str(db_path), model, embedding_backend)
 
     # Start chat loop
     while True:
@@ -176,6 +309,12 @@ def analyze(
     model: str = typer.Option(
         "gpt-3.5-turbo", "--model", "-m", help="OpenAI model to use"
     ),
+    embedding_backend: str = typer.Option(
+        "fp32",
+        "--embedding-backend",
+        "-e",
+        help="Embedding model backend (fp32 or onnx-int8)",
+    ),
 ):
     """Perform a syntopical analysis on a specific topic."""
     # Check if OpenAI API key is set
@@ -187,16 +326,15 @@ def analyze(
         )
         return
 
-    console.print(Panel(
-        f"Performing syntopical analysis on topic: [bold]{topic}[/bold]",
-        title="SyntopicalChat"
-    ))
-
-    # Initialize vector database
-    vector_db = VectorDBStorage(persist_directory=db_path)
+    console.print(
+        Panel(
+            f"Performing syntopical analysis on topic: [bold]{topic}[/bold]",
+            title="SyntopicalChat",
+        )
+    )
 
-    # Initialize chat
-    chat = SyntopicalChat(vector_db=vector_db, model_name=model)
+    # Initialize chat, reusing an already loaded vector database
+    chat = _get_chat(str(db_path), model, embedding_backend)
 
     try:
         with console.status("Analyzing...", spinner="dots"):
@@ -220,11 +358,23 @@ def analyze(
 @app.command()
 def start(
     db_path: Path = typer.Option(
-        os.environ.get("DB_PATH", "data/chroma_db"), "--db-path", "-d", help="Path to the vector database"
+        os.environ.get("DB_PATH", "data/chroma_db"),
+        "--db-path",
+        "-d",
+        help="Path to the vector database",
     ),
     model: str = typer.Option(
         "gpt-3.5-turbo", "--model", "-m", help="OpenAI model to use"
     ),
+    workers: Optional[int] = typer.Option(
+        None, "--workers", "-w", help="Number of processes used to parse PDFs"
+    ),
+    embedding_backend: str = typer.Option(
+        "fp32",
+        "--embedding-backend",
+        "-e",
+        help="Embedding model backend (fp32 or onnx-int8)",
+    ),
 ):
     """
     Start the SyntopicalChat application.
@@ -234,11 +384,13 @@ def start(
     2. Process the selected papers
     3. Start a chat session about the papers
     """
-    console.print(Panel(
-        "Welcome to SyntopicalChat!\n"
-        "This application allows you to chat with an LLM about academic papers.",
-        title="SyntopicalChat"
-    ))
+    console.print(
+        Panel(
+            "Welcome to SyntopicalChat!\n"
+            "This application allows you to chat with an LLM about academic papers.",
+            title="SyntopicalChat",
+        )
+    )
 
     # Check if OpenAI API key is set
     if not os.environ.get("OPENAI_API_KEY"):
@@ -251,13 +403,13 @@ def start(
 
     # Initialize components
     pdf_processor = PDFProcessor()
-    vector_db = VectorDBStorage(persist_directory=db_path)
+    vector_db = _get_vector_db(str(db_path), embedding_backend)
 
     # Prompt user to choose between folder and Arxiv
     choice = Prompt.ask(
         "Would you like to [bold]specify a folder[/bold] with PDFs or [bold]search Arxiv[/bold]?",
         choices=["folder", "arxiv"],
-        default="folder"
+        default="folder",
     )
 
     pdf_paths = []
@@ -265,39 +417,53 @@ def start(
     if choice.lower() == "folder":
         # Prompt for folder path with default from environment
         default_pdf_dir = os.environ.get("PDF_DIR", "data/pdfs")
-        folder_path = Prompt.ask("Enter the path to the folder containing PDFs", default=default_pdf_dir)
+        folder_path = Prompt.ask(
+            "Enter the path to the folder containing PDFs", default=default_pdf_dir
+        )
         folder_path = Path(folder_path).expanduser().resolve()
 
         if not folder_path.exists() or not folder_path.is_dir():
-            console.print(f"❌ Folder {folder_path} does not exist or is not a directory.", style="bold red")
+            console.print(
+                f"❌ Folder {folder_path} does not exist or is not a directory.",
+                style="bold red",
+            )
             return
 
-        # Find all PDFs in the folder
-        pdf_paths = list(folder_path.glob("*.pdf"))
+        # Find the PDFs in the folder lazily, so parsing starts while the
+        # folder is still being scanned
+        pdf_paths = iter_pdf_paths(folder_path)
+        first_pdf = next(pdf_paths, None)
 
-        if not pdf_paths:
+        if first_pdf is None:
             console.print(f"❌ No PDF files found in {folder_path}.", style="bold red")
             return
 
-        console.print(f"Found [bold]{len(pdf_paths)}[/bold] PDF files in {folder_path}.")
+        pdf_paths = itertools.chain([first_pdf], pdf_paths)
+
+        console.print(f"Found PDF files in {folder_path}.")
 
     else:  # Arxiv
         # Prompt for Arxiv query
         query = Prompt.ask("Enter your Arxiv search query")
-        max_results = IntPrompt.ask("Enter the maximum number of papers to download", default=5)
+        max_results = IntPrompt.ask(
+            "Enter the maximum number of papers to download", default=5
+        )
 
         console.print(f"Searching Arxiv for [bold]{query}[/bold]...")
 
         # Initialize Arxiv client with download directory from environment
         arxiv_dir = os.environ.get("ARXIV_DIR", "data/arxiv_papers")
-        arxiv_client = ArxivClient(download_dir=Path(arxiv_dir))
-
-        # Search and download papers
-        with console.status("Searching and downloading papers from Arxiv...", spinner="dots"):
-            results = arxiv_client.search_and_download(query, max_results)
+        with ArxivClient(download_dir=Path(arxiv_dir)) as arxiv_client:
+            # Search and download papers
+            with console.status(
+                "Searching and downloading papers from Arxiv...", spinner="dots"
+            ):
+                results = arxiv_client.search_and_download(query, max_results)
 
         if not results:
-            console.print("❌ No papers found on Arxiv matching your query.", style="bold red")
+            console.print(
+                "❌ No papers found on Arxiv matching your query.", style="bold red"
+            )
             return
 
         console.print(f"Downloaded [bold]{len(results)}[/bold] papers from Arxiv.")
@@ -306,34 +472,27 @@ def start(
         pdf_paths = [pdf_path for _, pdf_path in results]
 
     # Process PDFs and add to vector database
-    console.print(Panel("Processing papers and adding to vector database...", title="SyntopicalChat"))
-
-    for pdf_path in pdf_paths:
-        try:
-            console.print(f"Processing [bold]{pdf_path}[/bold]...")
-
-            # Process PDF
-            paper_content = pdf_processor.process_pdf(pdf_path)
-
-            # Add to vector database
-            vector_db.add_paper(paper_content)
-
-            console.print(f"✅ Successfully processed [bold]{paper_content.metadata.title}[/bold]")
+    console.print(
+        Panel(
+            "Processing papers and adding to vector database...", title="SyntopicalChat"
+        )
+    )
 
-        except Exception as e:
-            console.print(f"❌ Error processing {pdf_path}: {str(e)}", style="bold red")
+    _ingest_pdfs(pdf_paths, pdf_processor, vector_db, workers)
 
     console.print(Panel("Processing complete!", title="SyntopicalChat"))
 
     # Start chat session
-    console.print(Panel(
-        "You can now chat with the LLM about the papers.\n"
-        "Type 'exit' or 'quit' to end the session.",
-        title="SyntopicalChat"
-    ))
+    console.print(
+        Panel(
+            "You can now chat with the LLM about the papers.\n"
+            "Type 'exit' or 'quit' to end the session.",
+            title="SyntopicalChat",
+        )
+    )
 
     # Initialize chat
-    chat_interface = SyntopicalChat(vector_db=vector_db, model_name=model)
+    chat_interface = _get_chat(str(db_path), model, embedding_backend)
 
     # Start chat loop
     while True:
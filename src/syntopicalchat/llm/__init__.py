@@ -1 +1 @@
-"""LLM integration module for interacting with language models via Langchain."""
\ No newline at end of file
+"""LLM integration module for interacting with language models via Langchain."""
@@ -1,15 +1,120 @@
 """Chat implementation for interacting with language models via Langchain."""
 
+import functools
 import os
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
 
+from langchain.callbacks.manager import Callbacks
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
+from langchain.prompts import PromptTemplate
+from langchain.retrievers import ContextualCompressionRetriever
+from langchain.retrievers.document_compressors.base import BaseDocumentCompressor
 from langchain.schema import Document
 from langchain_openai import ChatOpenAI
 
 from syntopicalchat.vector_db.storage import VectorDBStorage
 
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+# Cross-encoder used to rerank retrieved chunks before they reach the LLM
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Static instructions for syntopical analysis, wrapped around each question
+_SYNTOPIC_PREAMBLE_PREFIX = (
+    "Perform a syntopical analysis across multiple academic papers to answer: "
+)
+_SYNTOPIC_PREAMBLE_SUFFIX = (
+    "Consider different perspectives, methodologies, and findings from all "
+    "relevant papers. "
+    "Identify agreements, disagreements, and complementary insights between "
+    "the papers. "
+    "Cite specific papers when referencing their content."
+)
+
+# Prompt for answering from the retrieved excerpts. The preamble is applied
+# here rather than to the query so the retriever only embeds the question.
+_SYNTOPIC_PROMPT = PromptTemplate.from_template(
+    "Use the following excerpts from academic papers to answer the question.\n\n"
+    "{context}\n\n"
+    + _SYNTOPIC_PREAMBLE_PREFIX
+    + "{question}\n"
+    + _SYNTOPIC_PREAMBLE_SUFFIX
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_llm(model_name: str, temperature: float, max_tokens: int) -> ChatOpenAI:
+    """
+    Get a chat model client, reusing one already built with the same settings.
+
+    Args:
+        model_name: Name of the OpenAI model to use.
+        temperature: Temperature for the model.
+        max_tokens: Maximum number of tokens to generate.
+
+    Returns:
+        Chat model client.
+    """
+    return ChatOpenAI(
+        model_name=model_name,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+
+
+@functools.lru_cache(maxsize=2)
+def _get_cross_encoder(model_name: str) -> "CrossEncoder":
+    """
+    Get a cross-encoder, loading the model only once per process.
+
+    Args:
+        model_name: Name of the cross-encoder model to use.
+
+    Returns:
+        Cross-encoder model.
+    """
+    # Imported here so that commands which never rerank do not load torch
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, device="cpu")
+
+
+class CrossEncoderReranker(BaseDocumentCompressor):
+    """Document compressor that keeps the chunks a cross-encoder scores highest."""
+
+    model_name: str = DEFAULT_RERANK_MODEL
+    top_n: int = 5
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        """
+        Rerank documents by their relevance to the query.
+
+        Args:
+            documents: Retrieved documents.
+            query: Query string.
+            callbacks: Unused; required by the compressor interface.
+
+        Returns:
+            The top_n most relevant documents, most relevant first.
+        """
+        if not documents:
+            return []
+
+        # Score all pairs in a single batch
+        scores = _get_cross_encoder(self.model_name).predict(
+            [(query, doc.page_content) for doc in documents]
+        )
+        ranked = sorted(zip(scores, range(len(documents))), reverse=True)
+
+        return [documents[i] for _, i in ranked[: self.top_n]]
+
 
 class SyntopicalChat:
     """Chat interface for syntopical analysis of academic papers."""
@@ -20,6 +125,9 @@ class SyntopicalChat:
         model_name: str = "gpt-3.5-turbo",
         temperature: float = 0.7,
         max_tokens: int = 1000,
+        fetch_k: int = 20,
+        top_k: int = 5,
+        rerank_model: Optional[str] = DEFAULT_RERANK_MODEL,
     ):
         """
         Initialize the chat interface.
@@ -29,8 +137,15 @@ class SyntopicalChat:
             model_name: Name of the OpenAI model to use.
             temperature: Temperature for the model.
             max_tokens: Maximum number of tokens to generate.
+            fetch_k: Number of chunks to retrieve before reranking.
+            top_k: Number of chunks passed to the language model.
+            rerank_model: Name of the cross-encoder used to rerank the
+                retrieved chunks, or None to use the top_k nearest chunks.
         """
         self.vector_db = vector_db
+        self.fetch_k = fetch_k
+        self.top_k = top_k
+        self.rerank_model = rerank_model
 
         # Check if OpenAI API key is set
         if not os.environ.get("OPENAI_API_KEY"):
@@ -40,11 +155,7 @@ class SyntopicalChat:
             )
 
         # Initialize the language model
-        self.llm = ChatOpenAI(
-            model_name=model_name,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
+        self.llm = _get_llm(model_name, temperature, max_tokens)
 
         # Initialize conversation memory
         self.memory = ConversationBufferMemory(
@@ -65,11 +176,36 @@ class SyntopicalChat:
         """
         return ConversationalRetrievalChain.from_llm(
             llm=self.llm,
-            retriever=self.vector_db.vector_store.as_retriever(
-                search_kwargs={"k": 5}
-            ),
+            retriever=self._create_retriever(),
             memory=self.memory,
             return_source_documents=True,
+            combine_docs_chain_kwargs={"prompt": _SYNTOPIC_PROMPT},
+        )
+
+    def _create_retriever(self):
+        """
+        Create the retriever for the chain.
+
+        Over-fetches fetch_k chunks by vector similarity and lets a local
+        cross-encoder pick the top_k, so the language model only sees the
+        most relevant chunks without any extra LLM calls.
+
+        Returns:
+            Retriever for the chain.
+        """
+        if self.rerank_model is None:
+            return self.vector_db.vector_store.as_retriever(
+                search_kwargs={"k": self.top_k}
+            )
+
+        return ContextualCompressionRetriever(
+            base_compressor=CrossEncoderReranker(
+                model_name=self.rerank_model,
+                top_n=self.top_k,
+            ),
+            base_retriever=self.vector_db.vector_store.as_retriever(
+                search_kwargs={"k": self.fetch_k}
+            ),
         )
 
     def chat(self, query: str) -> Dict:
@@ -82,35 +218,15 @@ class SyntopicalChat:
         Returns:
             Response from the language model and source documents.
         """
-        # Add syntopical analysis context to the query
-        enhanced_query = self._enhance_query(query)
-
-        # Get response from the chain
-        response = self.chain({"question": enhanced_query})
+        # Get response from the chain; the syntopical analysis instructions
+        # are part of the answer prompt
+        response = self.chain({"question": query})
 
         return {
             "answer": response["answer"],
             "source_documents": response["source_documents"],
         }
 
-    def _enhance_query(self, query: str) -> str:
-        """
-        Enhance the query with syntopical analysis context.
-
-        Args:
-            query: Original query string.
-
-        Returns:
-            Enhanced query string.
-        """
-        # Add context for syntopical analysis
-        return (
-            f"Perform a syntopical analysis across multiple academic papers to answer: {query}\n"
-            "Consider different perspectives, methodologies, and findings from all relevant papers. "
-            "Identify agreements, disagreements, and complementary insights between the papers. "
-            "Cite specific papers when referencing their content."
-        )
-
     def analyze_topic(self, topic: str) -> Dict:
         """
         Perform a syntopical analysis on a specific topic.
@@ -1 +1 @@
-"""PDF processing module for extracting text and metadata from academic papers."""
\ No newline at end of file
+"""PDF processing module for extracting text and metadata from academic papers."""
@@ -1,10 +1,51 @@
 """PDF processor implementation for extracting text and metadata from academic papers."""
 
+import functools
+import hashlib
+import io
+import itertools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import pypdf
+from huggingface_hub import try_to_load_from_cache
 from pydantic import BaseModel
+from semantic_text_splitter import TextSplitter
+from tokenizers import Tokenizer
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# Default number of worker processes used for parsing batches of PDFs
+DEFAULT_WORKERS = min(8, max(1, int((os.cpu_count() or 1) * 0.75)))
+
+# Supported text extraction backends
+PDF_BACKENDS = ("pypdfium2", "pypdf")
+
+# Chunks are measured in tokens of the embedding model's tokenizer. MiniLM
+# truncates its input at 256 tokens, including the two special tokens it adds,
+# so chunks of 254 tokens are embedded whole with little padding.
+DEFAULT_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_CHUNK_SIZE = 254
+DEFAULT_CHUNK_OVERLAP = 32
+
+# Section headers used to locate the abstract, matched case-insensitively
+_ABSTRACT_RE = re.compile(r"abstract", re.IGNORECASE)
+
+# Headers that may end the abstract. The introduction takes priority over the
+# other markers, but all of them are found in a single scan.
+_ABSTRACT_END_RE = re.compile(
+    r"(?P<introduction>introduction)|keywords|background|\b1\.|\bi\.",
+    re.IGNORECASE,
+)
+
+# First non-blank line of a page, used as a fallback title
+_FIRST_LINE_RE = re.compile(r"^[ \t]*(\S[^\n]*)", re.MULTILINE)
 
 
 class PaperMetadata(BaseModel):
@@ -17,6 +58,7 @@ class PaperMetadata(BaseModel):
     keywords: List[str] = []
     doi: Optional[str] = None
     source_file: Path
+    sha256: Optional[str] = None
 
 
 class PaperContent(BaseModel):
@@ -25,14 +67,56 @@ class PaperContent(BaseModel):
     metadata: PaperMetadata
     text: str
     sections: Dict[str, str] = {}
+    chunks: List[str] = []
 
 
 class PDFProcessor:
     """Processor for extracting text and metadata from PDF files."""
 
-    def __init__(self):
-        """Initialize the PDF processor."""
-        pass
+    def __init__(
+        self,
+        backend: str = "pypdfium2",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+        tokenizer: Optional[str] = DEFAULT_TOKENIZER,
+    ):
+        """
+        Initialize the PDF processor.
+
+        Args:
+            backend: Library used for text extraction, either "pypdfium2" (a
+                much faster C++ PDFium binding) or "pypdf". Falls back to pypdf
+                if pypdfium2 is not installed. Metadata is always read with pypdf.
+            chunk_size: Maximum size of the text chunks produced for embedding.
+            chunk_overlap: Overlap between consecutive chunks.
+            tokenizer: Name of the HuggingFace tokenizer that chunk sizes are
+                measured with, normally the embedding model's. If None, chunk
+                sizes are measured in characters.
+        """
+        if backend not in PDF_BACKENDS:
+            raise ValueError(
+                f"Unknown PDF backend '{backend}'. "
+                f"Choose one of: {', '.join(PDF_BACKENDS)}."
+            )
+
+        if backend == "pypdfium2" and pdfium is None:
+            backend = "pypdf"
+
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = tokenizer
+
+    @property
+    def text_splitter(self) -> TextSplitter:
+        """
+        Text splitter for chunking papers, so chunking happens alongside
+        parsing (in the worker processes) rather than at insert time.
+
+        The native splitter cannot be pickled, so it is not stored on the
+        processor but built once per process instead.
+        """
+        return get_text_splitter(self.chunk_size, self.chunk_overlap, self.tokenizer)
 
     def extract_metadata(self, pdf_path: Path) -> PaperMetadata:
         """
@@ -44,24 +128,7 @@ class PDFProcessor:
         Returns:
             Metadata for the paper.
         """
-        reader = pypdf.PdfReader(pdf_path)
-        info = reader.metadata
-        
-        # Extract title from metadata or first page
-        title = info.title if info and info.title else self._extract_title_from_text(reader)
-        
-        # Extract authors from metadata
-        authors = []
-        if info and info.author:
-            # Split author string by common separators
-            authors = [a.strip() for a in info.author.split(",")]
-        
-        return PaperMetadata(
-            title=title or pdf_path.stem,
-            authors=authors,
-            publication_date=info.creation_date.strftime("%Y-%m-%d") if info and info.creation_date else None,
-            source_file=pdf_path
-        )
+        return self._extract_metadata_from_reader(pypdf.PdfReader(pdf_path), pdf_path)
 
     def extract_text(self, pdf_path: Path) -> str:
         """
@@ -73,40 +140,167 @@ class PDFProcessor:
         Returns:
             Extracted text from the PDF.
         """
-        reader = pypdf.PdfReader(pdf_path)
-        text = ""
-        
-        for page in reader.pages:
-            text += page.extract_text() + "\n\n"
-            
-        return text
+        if self.backend == "pypdfium2":
+            return self._extract_text_with_pdfium(pdf_path)
 
-    def process_pdf(self, pdf_path: Path) -> PaperContent:
+        return self._extract_text_from_reader(pypdf.PdfReader(pdf_path))
+
+    def process_pdf(self, pdf_path: Path, sha256: Optional[str] = None) -> PaperContent:
         """
         Process a PDF file to extract content and metadata.
 
         Args:
             pdf_path: Path to the PDF file.
+            sha256: SHA-256 hex digest of the file, if already known.
 
         Returns:
             Processed paper content.
         """
-        metadata = self.extract_metadata(pdf_path)
-        text = self.extract_text(pdf_path)
-        
+        # Read the file in one call so that the parsers seek around in memory
+        # instead of issuing many small reads, and hash the same bytes unless
+        # the digest is already known
+        data = pdf_path.read_bytes()
+
+        # Parse the file once and share the reader for metadata and text
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        metadata = self._extract_metadata_from_reader(reader, pdf_path)
+        metadata.sha256 = sha256 or hashlib.sha256(data).hexdigest()
+
+        if self.backend == "pypdfium2":
+            text = self._extract_text_with_pdfium(data)
+        else:
+            text = self._extract_text_from_reader(reader)
+
         # Try to extract abstract and sections
         sections = self._extract_sections(text)
-        
+
         # Update metadata with abstract if found
         if "abstract" in sections:
             metadata.abstract = sections["abstract"]
-            
+
         return PaperContent(
             metadata=metadata,
             text=text,
-            sections=sections
+            sections=sections,
+            chunks=self.text_splitter.chunks(text),
+        )
+
+    def process_pdfs(
+        self,
+        pdf_paths: Iterable[Path],
+        max_workers: Optional[int] = None,
+        digests: Optional[Dict[Path, str]] = None,
+    ) -> Iterator[Tuple[Path, Union[PaperContent, Exception]]]:
+        """
+        Process several PDF files, parsing them in parallel worker processes.
+
+        pdf_paths may be a lazy iterator (e.g. from iter_pdf_paths); files are
+        handed to the workers as they are produced.
+
+        Args:
+            pdf_paths: Paths to the PDF files.
+            max_workers: Number of worker processes. Defaults to DEFAULT_WORKERS;
+                a value of 1 processes the files serially in this process.
+            digests: Already computed SHA-256 hex digests of the files, by
+                path, so they are not hashed again. May be filled in while
+                pdf_paths is iterated.
+
+        Yields:
+            Tuples of the PDF path and either its processed content or the
+            exception raised while processing it, in the order of pdf_paths.
+        """
+        max_workers = max_workers or DEFAULT_WORKERS
+        digests = digests if digests is not None else {}
+
+        # Peek ahead so that a single file is parsed without starting a pool
+        pdf_paths = iter(pdf_paths)
+        head = list(itertools.islice(pdf_paths, 2))
+        pdf_paths = itertools.chain(head, pdf_paths)
+
+        if max_workers <= 1 or len(head) <= 1:
+            for pdf_path in pdf_paths:
+                try:
+                    yield pdf_path, self.process_pdf(pdf_path, digests.get(pdf_path))
+                except Exception as e:
+                    yield pdf_path, e
+            return
+
+        paths, submitted_paths, digest_paths = itertools.tee(pdf_paths, 3)
+        submitted_digests = (digests.get(pdf_path) for pdf_path in digest_paths)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            process = functools.partial(_process_pdf_standalone, self)
+            yield from zip(
+                paths, executor.map(process, submitted_paths, submitted_digests)
+            )
+
+    def _extract_metadata_from_reader(
+        self, reader: pypdf.PdfReader, pdf_path: Path
+    ) -> PaperMetadata:
+        """
+        Extract metadata from an already opened PDF.
+
+        Args:
+            reader: PDF reader object.
+            pdf_path: Path to the PDF file.
+
+        Returns:
+            Metadata for the paper.
+        """
+        info = reader.metadata
+
+        # Extract title from metadata or first page
+        title = (
+            info.title if info and info.title else self._extract_title_from_text(reader)
         )
 
+        # Extract authors from metadata
+        authors = []
+        if info and info.author:
+            # Split author string by common separators
+            authors = [a.strip() for a in info.author.split(",")]
+
+        return PaperMetadata(
+            title=title or pdf_path.stem,
+            authors=authors,
+            publication_date=info.creation_date.strftime("%Y-%m-%d")
+            if info and info.creation_date
+            else None,
+            source_file=pdf_path,
+        )
+
+    def _extract_text_from_reader(self, reader: pypdf.PdfReader) -> str:
+        """
+        Extract text from an already opened PDF.
+
+        Args:
+            reader: PDF reader object.
+
+        Returns:
+            Extracted text from the PDF.
+        """
+        # Join once rather than concatenating page by page, which is quadratic
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+    def _extract_text_with_pdfium(self, pdf: Union[Path, bytes]) -> str:
+        """
+        Extract text from a PDF file using PDFium.
+
+        Args:
+            pdf: Path to the PDF file, or its contents.
+
+        Returns:
+            Extracted text from the PDF.
+        """
+        pdf = pdfium.PdfDocument(pdf)
+        try:
+            text = "\n\n".join(page.get_textpage().get_text_range() for page in pdf)
+        finally:
+            pdf.close()
+
+        # PDFium uses CRLF line endings; normalize to match pypdf
+        return text.replace("\r\n", "\n")
+
     def _extract_title_from_text(self, reader: pypdf.PdfReader) -> str:
         """
         Extract title from the first page text.
@@ -119,16 +313,13 @@ class PDFProcessor:
         """
         if not reader.pages:
             return ""
-            
-        first_page_text = reader.pages[0].extract_text()
-        lines = first_page_text.split("\n")
-        
-        # Heuristic: first non-empty line is often the title
-        for line in lines:
-            if line.strip():
-                return line.strip()
-                
-        return ""
+
+        first_page_text = reader.pages[0].extract_text() or ""
+
+        # Heuristic: first non-empty line is often the title. A regex scan
+        # finds it without splitting the whole page into lines.
+        match = _FIRST_LINE_RE.search(first_page_text)
+        return match.group(1).strip() if match else ""
 
     def _extract_sections(self, text: str) -> Dict[str, str]:
         """
@@ -141,38 +332,131 @@ class PDFProcessor:
             Dictionary of section names to section content.
         """
         sections = {}
-        
+
         # Simple heuristic to find abstract
-        lower_text = text.lower()
-        abstract_start = lower_text.find("abstract")
-        
-        if abstract_start != -1:
-            # Find the end of the abstract (next section or introduction)
-            intro_start = lower_text.find("introduction", abstract_start)
-            if intro_start == -1:
-                # If no introduction, look for other common section headers
-                possible_ends = [
-                    lower_text.find("keywords", abstract_start),
-                    lower_text.find("1.", abstract_start),
-                    lower_text.find("i.", abstract_start),
-                    lower_text.find("background", abstract_start),
-                ]
-                possible_ends = [pos for pos in possible_ends if pos != -1]
-                
-                if possible_ends:
-                    abstract_end = min(possible_ends)
-                else:
-                    # If no clear end, take a reasonable chunk
-                    abstract_end = abstract_start + 1500
-            else:
-                abstract_end = intro_start
-                
-            # Extract the abstract text
-            abstract_text = text[abstract_start:abstract_end].strip()
-            # Remove the "abstract" header
-            if abstract_text.lower().startswith("abstract"):
-                abstract_text = abstract_text[8:].strip()
-                
-            sections["abstract"] = abstract_text
-            
-        return sections
\ No newline at end of file
+        abstract_match = _ABSTRACT_RE.search(text)
+
+        if abstract_match:
+            abstract_start = abstract_match.end()
+
+            # Find the end of the abstract: the introduction if there is one,
+            # otherwise the first other common section header
+            abstract_end = None
+            for end_match in _ABSTRACT_END_RE.finditer(text, abstract_start):
+                if end_match.group("introduction"):
+                    abstract_end = end_match.start()
+                    break
+                if abstract_end is None:
+                    abstract_end = end_match.start()
+
+            if abstract_end is None:
+                # If no clear end, take a reasonable chunk
+                abstract_end = abstract_match.start() + 1500
+
+            # Extract the abstract text without the "abstract" header
+            sections["abstract"] = text[abstract_start:abstract_end].strip()
+
+        return sections
+
+
+@functools.lru_cache(maxsize=4)
+def get_text_splitter(
+    chunk_size: int, chunk_overlap: int, tokenizer: Optional[str] = None
+) -> TextSplitter:
+    """
+    Get a text splitter, reusing one already built with the same settings.
+
+    The splitter runs in native code and splits recursively at paragraph,
+    sentence and word boundaries.
+
+    Args:
+        chunk_size: Maximum size of a chunk.
+        chunk_overlap: Size of the overlap between consecutive chunks.
+        tokenizer: Name of the HuggingFace tokenizer that sizes are measured
+            with. If None, sizes are measured in characters.
+
+    Returns:
+        Text splitter.
+    """
+    if tokenizer is None:
+        return TextSplitter(capacity=chunk_size, overlap=chunk_overlap)
+
+    return TextSplitter.from_huggingface_tokenizer(
+        load_tokenizer(tokenizer),
+        capacity=chunk_size,
+        overlap=chunk_overlap,
+    )
+
+
+def load_tokenizer(name: str) -> Tokenizer:
+    """
+    Load a HuggingFace tokenizer, from the local cache if it is there.
+
+    The embedding model is downloaded along with its tokenizer, so once it
+    has been used the tokenizer loads without a request to the Hub.
+
+    Args:
+        name: Name of the tokenizer on the HuggingFace Hub.
+
+    Returns:
+        Tokenizer.
+    """
+    tokenizer_file = try_to_load_from_cache(name, "tokenizer.json")
+    if isinstance(tokenizer_file, str):
+        return Tokenizer.from_file(tokenizer_file)
+
+    return Tokenizer.from_pretrained(name)
+
+
+def iter_pdf_paths(folder_path: Path) -> Iterator[Path]:
+    """
+    Lazily yield the PDF files in a folder.
+
+    Uses os.scandir, whose directory entries carry the file type, so no extra
+    stat call is made per entry.
+
+    Args:
+        folder_path: Folder to search.
+
+    Yields:
+        Paths to the PDF files in the folder.
+    """
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(".pdf") and entry.is_file():
+                yield Path(entry.path)
+
+
+def pdf_sha256(pdf_path: Path) -> str:
+    """
+    Compute the SHA-256 digest of a PDF file, used to detect duplicate uploads.
+
+    Args:
+        pdf_path: Path to the PDF file.
+
+    Returns:
+        Hex digest of the file contents.
+    """
+    with open(pdf_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _process_pdf_standalone(
+    processor: PDFProcessor, pdf_path: Path, sha256: Optional[str] = None
+) -> Union[PaperContent, Exception]:
+    """
+    Process a PDF file inside a worker process.
+
+    Args:
+        processor: PDF processor whose settings to use.
+        pdf_path: Path to the PDF file.
+        sha256: SHA-256 hex digest of the file, if already known.
+
+    Returns:
+        Processed paper content, or the exception raised while processing it so
+        that a single bad file does not abort the rest of the batch.
+    """
+    try:
+        return processor.process_pdf(pdf_path, sha256)
+    except Exception as e:
+        return e
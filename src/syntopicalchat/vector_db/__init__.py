@@ -1 +1 @@
-"""Vector database module for storing and retrieving document embeddings."""
\ No newline at end of file
+"""Vector database module for storing and retrieving document embeddings."""
@@ -1,17 +1,543 @@
 """Vector database storage implementation for document embeddings."""
 
+import asyncio
+import functools
+import hashlib
+import itertools
 import os
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import chromadb
-from chromadb.config import Settings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
+import diskcache
+import numpy as np
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.vectorstores import Chroma
+from semantic_text_splitter import TextSplitter
+
+from syntopicalchat.pdf_processor.processor import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    PaperContent,
+    get_text_splitter,
+)
+
+# Supported embedding model backends
+EMBEDDING_BACKENDS = ("fp32", "onnx-int8")
+
+# Name of the Chroma collection, langchain's default so that databases
+# created by earlier versions open unchanged
+COLLECTION_NAME = "langchain"
+
+# HNSW index defaults for new collections. A denser graph (M) and wider build
+# and query searches (ef) than Chroma's defaults (16, 100 and 10) give much
+# better recall for a modest cost in speed.
+DEFAULT_HNSW_M = 24
+DEFAULT_HNSW_CONSTRUCTION_EF = 128
+DEFAULT_HNSW_SEARCH_EF = 100
+
+# Number of vectors buffered before they are added to the HNSW index, and
+# added before the index is written to disk. Writes in between are kept in
+# Chroma's write-ahead log, so bulk ingests do not rewrite the index file
+# every few hundred chunks.
+HNSW_BATCH_SIZE = 1000
+HNSW_SYNC_THRESHOLD = 10000
+
+# Number of chunks embedded and written per step of the ingest pipeline
+INGEST_BATCH_SIZE = 1024
+
+# Table of papers kept next to the Chroma collection, with one row per paper
+# rather than per chunk. It holds the bulky paper metadata, so it is not
+# copied onto every chunk, and lets papers be listed without scanning chunks.
+_PAPERS_TABLE_COLUMNS = (
+    "paper_key",
+    "title",
+    "authors",
+    "publication_date",
+    "source_file",
+    "abstract",
+    "sha256",
+)
+_PAPERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    paper_key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    authors TEXT,
+    publication_date TEXT,
+    source_file TEXT,
+    abstract TEXT,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS papers_title ON papers (title);
+CREATE INDEX IF NOT EXISTS papers_sha256 ON papers (sha256);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    paper_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_paper_key ON chunks (paper_key);
+"""
+
+# Metadata stored on every chunk, which search filters are applied to directly
+_CHUNK_METADATA_KEYS = ("title", "paper_id", "chunk_idx")
+
+# SQL equivalents of the Chroma filter operators, for filters on paper metadata
+_FILTER_OPERATORS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+    "$in": "IN",
+    "$nin": "NOT IN",
+}
+
+# File names of the graph-optimized and int8 quantized ONNX exports
+_ONNX_OPTIMIZED_FILE = "model_optimized.onnx"
+_ONNX_QUANTIZED_FILE = "model_optimized_quantized.onnx"
+
+# Number of query embeddings to keep in memory
+QUERY_CACHE_SIZE = 256
+
+# Storage formats for the embedding cache: float32, float16 or int8
+CACHE_QUANTIZATIONS = ("fp32", "fp16", "sq8")
+
+# Number of chunks encoded per forward pass of the embedding model, on the
+# CPU and on a GPU respectively
+EMBEDDING_BATCH_SIZE = 64
+GPU_EMBEDDING_BATCH_SIZE = 128
+
+
+class QueryCachingEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes query embeddings.
+
+    Interactive sessions often repeat the same questions, and every retrieval
+    embeds the query again. Document embeddings are passed through uncached.
+    """
+
+    def __init__(self, embeddings: Embeddings, maxsize: int = QUERY_CACHE_SIZE):
+        """
+        Initialize the wrapper.
+
+        Args:
+            embeddings: Embedding function to wrap.
+            maxsize: Maximum number of query embeddings to cache.
+        """
+        self.embeddings = embeddings
+        self._cached_embed_query = functools.lru_cache(maxsize=maxsize)(
+            self._embed_query
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            Embeddings for the texts.
+        """
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, reusing the cached embedding for a repeated query.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Embedding for the query.
+        """
+        # Return a fresh list so callers cannot modify the cached embedding
+        return list(self._cached_embed_query(text))
+
+    def _embed_query(self, text: str) -> Tuple[float, ...]:
+        """
+        Embed a query without caching.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Embedding for the query.
+        """
+        return tuple(self.embeddings.embed_query(text))
+
+
+class DeferredEmbeddings(Embeddings):
+    """Embeddings that forward to an embedding function looked up on each call.
+
+    Lets the vector store be created before the embedding model is loaded.
+    """
+
+    def __init__(self, get_embeddings: Callable[[], Embeddings]):
+        """
+        Initialize the wrapper.
+
+        Args:
+            get_embeddings: Function returning the embedding function to use.
+        """
+        self.get_embeddings = get_embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            Embeddings for the texts.
+        """
+        return self.get_embeddings().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Embedding for the query.
+        """
+        return self.get_embeddings().embed_query(text)
+
+
+class ONNXMiniLMEmbeddings(Embeddings):
+    """Embeddings from an int8 quantized ONNX export of a sentence-transformer.
+
+    Intended for mean-pooling models such as all-MiniLM-L6-v2. The model is
+    exported with optimum, graph-optimized (O2) and dynamically quantized to
+    int8 on first use, then run directly with ONNX Runtime on the CPU.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Path,
+        max_length: int = 256,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+    ):
+        """
+        Initialize the embeddings, exporting the model if it is not cached.
+
+        Args:
+            model_name: Name of the sentence-transformer model.
+            cache_dir: Directory where the optimized model is cached.
+            max_length: Maximum number of tokens per text.
+            batch_size: Number of texts encoded per model run.
+        """
+        # Requires optimum's ONNX Runtime support (the "onnx" extra)
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        if not (cache_dir / _ONNX_QUANTIZED_FILE).exists():
+            self._export(model_name, cache_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(cache_dir))
+        self.session = ORTModelForFeatureExtraction.from_pretrained(
+            str(cache_dir),
+            file_name=_ONNX_QUANTIZED_FILE,
+            provider="CPUExecutionProvider",
+        ).model
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _export(model_name: str, cache_dir: Path) -> None:
+        """
+        Export, optimize and quantize a model into the cache directory.
+
+        Args:
+            model_name: Name of the sentence-transformer model.
+            cache_dir: Directory to write the exported model to.
+        """
+        from optimum.onnxruntime import (
+            ORTModelForFeatureExtraction,
+            ORTOptimizer,
+            ORTQuantizer,
+        )
+        from optimum.onnxruntime.configuration import (
+            AutoOptimizationConfig,
+            AutoQuantizationConfig,
+        )
+        from transformers import AutoTokenizer
+
+        model_name = _hub_model_id(model_name)
+
+        model = ORTModelForFeatureExtraction.from_pretrained(
+            model_name, export=True, provider="CPUExecutionProvider"
+        )
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(str(cache_dir))
+
+        ORTOptimizer.from_pretrained(model).optimize(
+            save_dir=str(cache_dir),
+            optimization_config=AutoOptimizationConfig.O2(),
+        )
+        ORTQuantizer.from_pretrained(
+            str(cache_dir), file_name=_ONNX_OPTIMIZED_FILE
+        ).quantize(
+            save_dir=str(cache_dir),
+            quantization_config=AutoQuantizationConfig.avx2(
+                is_static=False, per_channel=False
+            ),
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            Normalized embeddings for the texts.
+        """
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(
+                texts[start : start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden_states = self.session.run(
+                None,
+                {
+                    name: value
+                    for name, value in inputs.items()
+                    if name in self.input_names
+                },
+            )[0]
+            embeddings.extend(
+                _mean_pool_normalize(hidden_states, inputs["attention_mask"]).tolist()
+            )
+
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Normalized embedding for the query.
+        """
+        return self.embed_documents([text])[0]
+
+
+def _hub_model_id(model_name: str) -> str:
+    """
+    Get the HuggingFace Hub ID of a sentence-transformer model.
+
+    Args:
+        model_name: Name of the model.
+
+    Returns:
+        The name itself, or for short names the model in the
+        sentence-transformers organization.
+    """
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def _mean_pool_normalize(
+    hidden_states: np.ndarray, attention_mask: np.ndarray
+) -> np.ndarray:
+    """
+    Mean-pool token embeddings over the attention mask and L2-normalize them.
+
+    Args:
+        hidden_states: Token embeddings of shape (batch, tokens, dimensions).
+        attention_mask: Attention mask of shape (batch, tokens).
+
+    Returns:
+        Sentence embeddings of shape (batch, dimensions).
+    """
+    mask = attention_mask[..., np.newaxis].astype(hidden_states.dtype)
+    summed = (hidden_states * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+class EmbeddingCache:
+    """Disk-backed cache of chunk embeddings, keyed by a hash of the chunk text.
+
+    Re-ingesting a paper, or ingesting papers that share boilerplate text, can
+    then skip the embedding model for chunks it has already seen. Embeddings
+    are stored as float16 by default to halve the size of the cache, or as
+    int8 to quarter it.
+    """
+
+    def __init__(self, directory: Path, model_key: str, quantization: str = "fp16"):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory to store the cache in.
+            model_key: Identifies the model and backend producing the
+                embeddings, so that different models never share entries.
+            quantization: How to store the embeddings, one of
+                CACHE_QUANTIZATIONS. "sq8" scales each component to an int8,
+                which relies on the embeddings having unit length.
+        """
+        if quantization not in CACHE_QUANTIZATIONS:
+            raise ValueError(
+                f"Unknown cache quantization '{quantization}'. "
+                f"Choose one of: {', '.join(CACHE_QUANTIZATIONS)}."
+            )
+
+        self.cache = diskcache.Cache(str(directory))
+        self.model_key = model_key
+        self.quantization = quantization
+
+    def _key(self, text: str) -> bytes:
+        """
+        Get the cache key for a chunk.
+
+        Args:
+            text: Chunk text.
+
+        Returns:
+            SHA-256 digest of the model key, the quantization and the chunk
+            text.
+        """
+        return hashlib.sha256(
+            f"{self.model_key}\0{self.quantization}\0{text}".encode()
+        ).digest()
+
+    def _encode(self, embedding: List[float]) -> bytes:
+        """
+        Encode an embedding for storage.
 
-from syntopicalchat.pdf_processor.processor import PaperContent
+        Args:
+            embedding: Embedding to encode.
+
+        Returns:
+            The quantized embedding.
+        """
+        if self.quantization == "sq8":
+            # Components of a unit-length vector lie in [-1, 1]
+            scaled = np.clip(np.asarray(embedding, dtype=np.float32), -1.0, 1.0) * 127
+            return np.round(scaled).astype(np.int8).tobytes()
+
+        dtype = np.float16 if self.quantization == "fp16" else np.float32
+        return np.asarray(embedding, dtype=dtype).tobytes()
+
+    def _decode(self, value: bytes) -> List[float]:
+        """
+        Decode a stored embedding.
+
+        Args:
+            value: Quantized embedding.
+
+        Returns:
+            The embedding as float32 values.
+        """
+        if self.quantization == "sq8":
+            return (
+                np.frombuffer(value, dtype=np.int8).astype(np.float32) / 127
+            ).tolist()
+
+        dtype = np.float16 if self.quantization == "fp16" else np.float32
+        return np.frombuffer(value, dtype=dtype).astype(np.float32).tolist()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up the embeddings of several chunks.
+
+        Args:
+            texts: Chunk texts.
+
+        Returns:
+            The cached embedding of each chunk, or None where it is not cached.
+        """
+        embeddings = []
+        for text in texts:
+            value = self.cache.get(self._key(text))
+            embeddings.append(None if value is None else self._decode(value))
+
+        return embeddings
+
+    def set_many(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Store the embeddings of several chunks.
+
+        Args:
+            texts: Chunk texts.
+            embeddings: Embeddings of the chunks.
+        """
+        # A single transaction rather than one commit per chunk
+        with self.cache.transact():
+            for text, embedding in zip(texts, embeddings):
+                self.cache.set(self._key(text), self._encode(embedding))
+
+
+def _detect_device() -> str:
+    """
+    Choose the device to run the embedding model on.
+
+    The SYNTOPICAL_DEVICE environment variable takes precedence, e.g. set it to
+    "cpu" to opt out of GPU inference. Otherwise CUDA is preferred, then Apple
+    MPS, then the CPU. MPS can be slower than the CPU for small batches because
+    of the cost of copying data to the GPU.
+
+    Returns:
+        Name of the torch device.
+    """
+    device = os.environ.get("SYNTOPICAL_DEVICE")
+    if device:
+        return device
+
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+
+    return "cpu"
+
+
+def _paper_key(title: str, source_file: str, sha256: Optional[str]) -> str:
+    """
+    Get the key identifying a paper.
+
+    Args:
+        title: Title of the paper.
+        source_file: Path of the paper's PDF file.
+        sha256: SHA-256 digest of the PDF file, if known.
+
+    Returns:
+        The file digest where known, so the key is stable across re-ingests,
+        otherwise the source file and title.
+    """
+    return sha256 or f"{source_file}\0{title}"
+
+
+def _chunk_id(paper_key: str, chunk: str) -> str:
+    """
+    Get the ID of a chunk: a fixed-length hash of its paper and its text.
+
+    Args:
+        paper_key: Key identifying the paper the chunk belongs to.
+        chunk: Chunk text.
+
+    Returns:
+        32 character hex ID.
+    """
+    return hashlib.blake2b(f"{paper_key}\0{chunk}".encode(), digest_size=16).hexdigest()
 
 
 class VectorDBStorage:
@@ -21,35 +547,236 @@ class VectorDBStorage:
         self,
         persist_directory: Union[str, Path] = "data/chroma_db",
         embedding_model_name: str = "all-MiniLM-L6-v2",
+        embedding_backend: str = "fp32",
+        hnsw_m: int = DEFAULT_HNSW_M,
+        hnsw_construction_ef: int = DEFAULT_HNSW_CONSTRUCTION_EF,
+        hnsw_search_ef: int = DEFAULT_HNSW_SEARCH_EF,
+        cache_embeddings: bool = True,
+        cache_quantization: str = "fp16",
+        chroma_host: Optional[str] = None,
+        chroma_port: int = 8000,
     ):
         """
         Initialize the vector database storage.
 
+        The HNSW settings only apply when the database is created; an
+        existing collection keeps the settings, including the distance
+        metric, that its index was built with.
+
         Args:
             persist_directory: Directory to persist the database.
             embedding_model_name: Name of the HuggingFace embedding model to use.
+            embedding_backend: How to run the embedding model, either "fp32"
+                (PyTorch, on a GPU if one is available) or "onnx-int8" (an int8
+                quantized ONNX export, which is considerably faster on CPU). Use
+                the same backend for ingesting and querying a database.
+            hnsw_m: Number of neighbors per node in the HNSW index.
+            hnsw_construction_ef: Size of the candidate list while building
+                the index.
+            hnsw_search_ef: Size of the candidate list while searching.
+            cache_embeddings: Whether to cache chunk embeddings on disk, so
+                that chunks seen before are not embedded again.
+            cache_quantization: How to store cached embeddings, one of
+                CACHE_QUANTIZATIONS. "sq8" quarters the size of the cache
+                compared to float32 at a small loss of precision.
+            chroma_host: Host of a Chroma server to store the embeddings in.
+                If None, Chroma runs in this process and stores them under
+                persist_directory. The papers table and caches are always
+                kept under persist_directory.
+            chroma_port: Port of the Chroma server.
         """
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(
+                f"Unknown embedding backend '{embedding_backend}'. "
+                f"Choose one of: {', '.join(EMBEDDING_BACKENDS)}."
+            )
+
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
-        
-        # Initialize the embedding function
-        self.embedding_function = HuggingFaceEmbeddings(
-            model_name=embedding_model_name,
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
-        )
-        
-        # Initialize the vector store
+        self.embedding_model_name = embedding_model_name
+        self.embedding_backend = embedding_backend
+
+        # Cache of chunk embeddings, kept next to the database
+        self.embedding_cache = (
+            EmbeddingCache(
+                self.persist_directory / "emb_cache",
+                f"{embedding_model_name}\0{embedding_backend}",
+                cache_quantization,
+            )
+            if cache_embeddings
+            else None
+        )
+
+        # Initialize the vector store, either in process or on a Chroma server
+        # so that index updates run in a separate process
+        client = (
+            chromadb.HttpClient(host=chroma_host, port=chroma_port)
+            if chroma_host
+            else chromadb.PersistentClient(path=str(self.persist_directory))
+        )
+
+        # Chroma overwrites the metadata of an existing collection with the
+        # metadata it is opened with, which would relabel the distance metric
+        # of an index built with another one, so only configure new ones
+        collection_exists = any(
+            collection.name == COLLECTION_NAME
+            for collection in client.list_collections()
+        )
+        collection_metadata = None
+        if not collection_exists:
+            collection_metadata = {
+                # Both embedding backends return unit-length vectors, so the
+                # inner product ranks like cosine similarity without
+                # computing the norms for every distance
+                "hnsw:space": "ip",
+                "hnsw:M": hnsw_m,
+                "hnsw:construction_ef": hnsw_construction_ef,
+                "hnsw:search_ef": hnsw_search_ef,
+                "hnsw:batch_size": HNSW_BATCH_SIZE,
+                "hnsw:sync_threshold": HNSW_SYNC_THRESHOLD,
+            }
+
         self.vector_store = Chroma(
+            collection_name=COLLECTION_NAME,
+            client=client,
             persist_directory=str(self.persist_directory),
-            embedding_function=self.embedding_function,
+            # The embedding model is loaded on first use, not here
+            embedding_function=DeferredEmbeddings(lambda: self.embedding_function),
+            collection_metadata=collection_metadata,
+        )
+
+        # Initialize the papers table
+        self.papers_db = sqlite3.connect(
+            self.persist_directory / "papers.sqlite3", check_same_thread=False
+        )
+        self.papers_db.executescript(_PAPERS_SCHEMA)
+        self._backfill_papers()
+
+    @functools.cached_property
+    def embedding_function(self) -> Embeddings:
+        """
+        Embedding function, loading the embedding model on first access.
+
+        Query embeddings are cached, so that repeated questions in a session
+        are not embedded again.
+
+        Returns:
+            The embedding function.
+        """
+        return QueryCachingEmbeddings(
+            self._create_embedding_function(
+                self.embedding_model_name, self.embedding_backend
+            )
+        )
+
+    @functools.cached_property
+    def text_splitter(self) -> TextSplitter:
+        """
+        Text splitter for papers without chunks, loading its tokenizer on first access.
+
+        Chunks are measured with the embedding model's tokenizer, so they fit
+        its input.
+
+        Returns:
+            The text splitter.
+        """
+        return get_text_splitter(
+            DEFAULT_CHUNK_SIZE,
+            DEFAULT_CHUNK_OVERLAP,
+            _hub_model_id(self.embedding_model_name),
         )
-        
-        # Text splitter for chunking documents
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
+
+    def _backfill_papers(self) -> None:
+        """
+        Fill the papers and chunks tables from a database created without them.
+
+        Older databases stored the full paper metadata on every chunk, which
+        is copied into the papers table once. The chunk IDs of every paper are
+        recorded so that papers can be deleted by ID.
+        """
+        if self.papers_db.execute("SELECT 1 FROM chunks LIMIT 1").fetchone():
+            return
+
+        collection = self.vector_store._collection
+        if not collection.count():
+            return
+
+        paper_rows = {}
+        chunk_rows = []
+        result = collection.get(include=["metadatas"])
+        for chunk_id, metadata in zip(result["ids"], result["metadatas"]):
+            if metadata and "title" in metadata:
+                paper_key = metadata.get("paper_id") or _paper_key(
+                    metadata["title"],
+                    metadata.get("source_file", ""),
+                    metadata.get("sha256"),
+                )
+                paper_rows.setdefault(
+                    paper_key,
+                    (
+                        paper_key,
+                        *(metadata.get(column) for column in _PAPERS_TABLE_COLUMNS[1:]),
+                    ),
+                )
+                chunk_rows.append((chunk_id, paper_key))
+
+        # Papers already in the table keep their metadata, since chunks
+        # written after the table was introduced only store the title
+        self._insert_papers(paper_rows.values(), chunk_rows, conflict="IGNORE")
+
+    def _insert_papers(self, paper_rows, chunk_rows, conflict: str = "REPLACE") -> None:
+        """
+        Insert rows of the papers and chunks tables.
+
+        Args:
+            paper_rows: Rows with values for each of _PAPERS_TABLE_COLUMNS.
+            chunk_rows: (chunk_id, paper_key) rows.
+            conflict: SQLite conflict resolution for existing rows.
+        """
+        columns = ", ".join(_PAPERS_TABLE_COLUMNS)
+        placeholders = ", ".join("?" * len(_PAPERS_TABLE_COLUMNS))
+        with self.papers_db:
+            self.papers_db.executemany(
+                f"INSERT OR {conflict} INTO papers ({columns}) VALUES ({placeholders})",
+                paper_rows,
+            )
+            self.papers_db.executemany(
+                f"INSERT OR {conflict} INTO chunks (chunk_id, paper_key) VALUES (?, ?)",
+                chunk_rows,
+            )
+
+    def _create_embedding_function(self, model_name: str, backend: str) -> Embeddings:
+        """
+        Create the embedding function for a model and backend.
+
+        Args:
+            model_name: Name of the HuggingFace embedding model.
+            backend: Embedding backend, one of EMBEDDING_BACKENDS.
+
+        Returns:
+            Embedding function.
+        """
+        if backend == "onnx-int8":
+            # The optimized export is cached under the persist directory and
+            # reused on later runs
+            return ONNXMiniLMEmbeddings(
+                model_name,
+                self.persist_directory / ".onnx_cache" / model_name.replace("/", "__"),
+            )
+
+        device = _detect_device()
+
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": device},
+            encode_kwargs={
+                "normalize_embeddings": True,
+                "batch_size": (
+                    EMBEDDING_BATCH_SIZE
+                    if device == "cpu"
+                    else GPU_EMBEDDING_BATCH_SIZE
+                ),
+            },
         )
 
     def add_paper(self, paper: PaperContent) -> List[str]:
@@ -62,41 +789,210 @@ class VectorDBStorage:
         Returns:
             List of IDs for the added chunks.
         """
-        # Create metadata for the document
-        metadata = {
-            "title": paper.metadata.title,
-            "authors": ", ".join(paper.metadata.authors),
-            "publication_date": paper.metadata.publication_date or "",
-            "source_file": str(paper.metadata.source_file),
-        }
-        
-        if paper.metadata.abstract:
-            metadata["abstract"] = paper.metadata.abstract
-            
-        # Split the text into chunks
-        texts = self.text_splitter.split_text(paper.text)
-        
-        # Create documents with metadata
-        documents = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    **metadata,
-                    "chunk_id": f"{paper.metadata.title}-{i}",
-                }
-            )
-            for i, chunk in enumerate(texts)
-        ]
-        
-        # Add documents to the vector store
-        ids = [f"{paper.metadata.title}-{i}" for i in range(len(texts))]
-        self.vector_store.add_documents(documents, ids=ids)
-        
-        # Persist the database
-        self.vector_store.persist()
-        
+        return self.add_papers([paper])
+
+    def add_papers(self, papers: Iterable[PaperContent]) -> List[str]:
+        """
+        Add several papers to the vector database in a single batch.
+
+        The chunks of all papers are embedded and written together in large
+        batches, so the embedding model sees full batches regardless of the
+        size of each paper, and writing one batch overlaps with embedding the
+        next. Chunks are streamed into the batches rather than collected up
+        front, so only one batch of texts and metadata is held at a time.
+
+        Args:
+            papers: Paper contents to add.
+
+        Returns:
+            List of IDs for the added chunks.
+        """
+        ids = []
+        paper_rows = []
+        written_papers = 0
+
+        # Embed and write in batches, writing each batch from a background
+        # thread while the next one is embedded. The embedding model releases
+        # the GIL, so the database insert and the HNSW index update overlap
+        # with the model instead of waiting for it.
+        batch_size = min(INGEST_BATCH_SIZE, self.vector_store._client.max_batch_size)
+        pending_write: Optional[Future] = None
+
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for batch in itertools.batched(
+                self._iter_chunks(papers, paper_rows), batch_size
+            ):
+                batch_ids, texts, metadatas = map(list, zip(*batch))
+                embeddings = self._embed(texts)
+
+                # Wait for the previous batch, so at most one is buffered
+                if pending_write is not None:
+                    pending_write.result()
+
+                # The papers whose first chunk is in this batch
+                new_paper_rows = paper_rows[written_papers:]
+                written_papers = len(paper_rows)
+
+                pending_write = writer.submit(
+                    self._write_batch,
+                    new_paper_rows,
+                    batch_ids,
+                    embeddings,
+                    texts,
+                    metadatas,
+                )
+                ids.extend(batch_ids)
+
+            if pending_write is not None:
+                pending_write.result()
+
         return ids
 
+    def _write_batch(
+        self,
+        paper_rows: List[Tuple],
+        ids: List[str],
+        embeddings: List[List[float]],
+        texts: List[str],
+        metadatas: List[Dict[str, Union[str, int]]],
+    ) -> None:
+        """
+        Write a batch of embedded chunks to the papers tables and the collection.
+
+        The chunks are recorded before they are added to the collection, so
+        if adding fails part way through an ingest, every chunk in the
+        collection still belongs to a paper that can be listed and deleted.
+
+        Args:
+            paper_rows: Papers table rows of the papers first seen in the batch.
+            ids: IDs of the chunks.
+            embeddings: Embeddings of the chunks.
+            texts: Texts of the chunks.
+            metadatas: Metadata of the chunks.
+        """
+        self._insert_papers(
+            paper_rows,
+            [
+                (chunk_id, metadata["paper_id"])
+                for chunk_id, metadata in zip(ids, metadatas)
+            ],
+        )
+        self.vector_store._collection.add(
+            ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas
+        )
+
+    def _iter_chunks(
+        self, papers: Iterable[PaperContent], paper_rows: List[Tuple]
+    ) -> Iterator[Tuple[str, str, Dict[str, Union[str, int]]]]:
+        """
+        Iterate over the chunks of papers to add to the vector database.
+
+        Args:
+            papers: Paper contents to add.
+            paper_rows: List that a papers table row is appended to for each
+                paper with chunks.
+
+        Yields:
+            (chunk_id, text, metadata) tuples, skipping repeated chunks.
+        """
+        seen_ids = set()
+
+        for paper in papers:
+            # Bulky paper metadata goes to the papers table once per paper;
+            # each chunk only stores its title, for citing sources, and a
+            # reference to its paper
+            title = paper.metadata.title
+            source_file = str(paper.metadata.source_file)
+            paper_key = _paper_key(title, source_file, paper.metadata.sha256)
+
+            # Use the chunks from the PDF processor, splitting the text if absent
+            chunks = paper.chunks or self.text_splitter.chunks(paper.text)
+
+            if chunks:
+                paper_rows.append(
+                    (
+                        paper_key,
+                        title,
+                        ", ".join(paper.metadata.authors),
+                        paper.metadata.publication_date or "",
+                        source_file,
+                        paper.metadata.abstract or None,
+                        paper.metadata.sha256,
+                    )
+                )
+
+            for i, chunk in enumerate(chunks):
+                # Chunk IDs are derived from the paper key, so they are stable
+                # across re-ingests and distinct between papers
+                chunk_id = _chunk_id(paper_key, chunk)
+
+                # Repeated chunks within a paper are stored once
+                if chunk_id in seen_ids:
+                    continue
+
+                seen_ids.add(chunk_id)
+                yield chunk_id, chunk, {
+                    "title": title,
+                    "paper_id": paper_key,
+                    "chunk_idx": i,
+                }
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunks in a single pass over the embedding model.
+
+        Cached chunks are taken from the embedding cache. The remaining
+        distinct chunks are sorted by length so that each batch pads its
+        inputs to a similar length, then returned in their original order.
+
+        Args:
+            texts: Chunks to embed.
+
+        Returns:
+            Embeddings for the chunks, in the same order as texts.
+        """
+        if self.embedding_cache is not None:
+            embeddings = self.embedding_cache.get_many(texts)
+        else:
+            embeddings = [None] * len(texts)
+
+        # Group the uncached chunks by text, so repeated chunks are embedded once
+        missing: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(texts[i], []).append(i)
+
+        if not missing:
+            return embeddings
+
+        missing_texts = sorted(missing, key=len)
+        new_embeddings = self.embedding_function.embed_documents(missing_texts)
+
+        for text, embedding in zip(missing_texts, new_embeddings):
+            for i in missing[text]:
+                embeddings[i] = embedding
+
+        if self.embedding_cache is not None:
+            self.embedding_cache.set_many(missing_texts, new_embeddings)
+
+        return embeddings
+
+    def has_document(self, sha256: str) -> bool:
+        """
+        Check whether a paper with the given file digest has been added.
+
+        Args:
+            sha256: SHA-256 hex digest of the paper's PDF file.
+
+        Returns:
+            True if the paper is already in the database.
+        """
+        row = self.papers_db.execute(
+            "SELECT 1 FROM papers WHERE sha256 = ? LIMIT 1", (sha256,)
+        ).fetchone()
+
+        return row is not None
+
     def search(
         self, query: str, k: int = 5, filter_metadata: Optional[Dict] = None
     ) -> List[Document]:
@@ -106,16 +1002,131 @@ class VectorDBStorage:
         Args:
             query: Query string.
             k: Number of results to return.
-            filter_metadata: Optional metadata filter.
+            filter_metadata: Optional Chroma metadata filter. It may use the
+                chunk metadata (title, paper_id and chunk_idx) and the paper
+                metadata (authors, publication_date, source_file, abstract
+                and sha256).
 
         Returns:
             List of documents similar to the query.
+
+        Raises:
+            ValueError: If the filter uses any other key.
         """
-        return self.vector_store.similarity_search(
-            query=query,
-            k=k,
-            filter=filter_metadata,
+        # Query the collection directly with the (cached) query embedding,
+        # skipping the distances that similarity_search fetches and discards
+        result = self.vector_store._collection.query(
+            query_embeddings=[self.embedding_function.embed_query(query)],
+            n_results=k,
+            where=self._chunk_filter(filter_metadata) if filter_metadata else None,
+            include=["documents", "metadatas"],
         )
+        return [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(result["documents"][0], result["metadatas"][0])
+        ]
+
+    def _chunk_filter(self, where: Dict) -> Dict:
+        """
+        Translate a metadata filter into a filter on the chunk metadata.
+
+        Paper metadata is kept in the papers table rather than on the chunks,
+        so conditions on it are replaced by a condition on the IDs of the
+        matching papers.
+
+        Args:
+            where: Chroma metadata filter.
+
+        Returns:
+            Equivalent filter on the chunk metadata.
+
+        Raises:
+            ValueError: If the filter uses an unknown key or operator.
+        """
+        translated = {}
+
+        for key, value in where.items():
+            if key in ("$and", "$or"):
+                translated[key] = [self._chunk_filter(clause) for clause in value]
+            elif key in _CHUNK_METADATA_KEYS:
+                translated[key] = value
+            elif key in _PAPERS_TABLE_COLUMNS[2:]:
+                translated["paper_id"] = self._paper_ids_filter(key, value)
+            else:
+                raise ValueError(
+                    f"Cannot filter on '{key}'. Choose one of: "
+                    f"{', '.join(_CHUNK_METADATA_KEYS + _PAPERS_TABLE_COLUMNS[2:])}."
+                )
+
+        return translated
+
+    def _paper_ids_filter(self, column: str, condition: Union[str, Dict]) -> Dict:
+        """
+        Find the papers matching a condition on a column of the papers table.
+
+        Args:
+            column: Column of the papers table.
+            condition: Value to match, or a Chroma operator expression.
+
+        Returns:
+            Chroma condition on the paper_id of chunks.
+        """
+        if isinstance(condition, dict):
+            operator, operand = next(iter(condition.items()))
+        else:
+            operator, operand = "$eq", condition
+
+        if operator not in _FILTER_OPERATORS:
+            raise ValueError(
+                f"Unknown filter operator '{operator}'. "
+                f"Choose one of: {', '.join(_FILTER_OPERATORS)}."
+            )
+
+        operands = operand if isinstance(operand, list) else [operand]
+        placeholders = ", ".join("?" * len(operands))
+        if operator in ("$in", "$nin"):
+            placeholders = f"({placeholders})"
+
+        paper_keys = [
+            paper_key
+            for paper_key, in self.papers_db.execute(
+                f"SELECT paper_key FROM papers "
+                f"WHERE {column} {_FILTER_OPERATORS[operator]} {placeholders}",
+                operands,
+            )
+        ]
+
+        # Chroma rejects an empty $in list; no paper key is empty, so this
+        # matches no chunk
+        return {"$in": paper_keys} if paper_keys else {"$eq": ""}
+
+    async def aadd_papers(self, papers: List[PaperContent]) -> List[str]:
+        """
+        Add several papers to the vector database without blocking the event loop.
+
+        Args:
+            papers: Paper contents to add.
+
+        Returns:
+            List of IDs for the added chunks.
+        """
+        return await asyncio.to_thread(self.add_papers, papers)
+
+    async def asearch(
+        self, query: str, k: int = 5, filter_metadata: Optional[Dict] = None
+    ) -> List[Document]:
+        """
+        Search for documents similar to the query without blocking the event loop.
+
+        Args:
+            query: Query string.
+            k: Number of results to return.
+            filter_metadata: Optional metadata filter.
+
+        Returns:
+            List of documents similar to the query.
+        """
+        return await asyncio.to_thread(self.search, query, k, filter_metadata)
 
     def get_all_papers(self) -> List[Dict]:
         """
@@ -124,23 +1135,21 @@ class VectorDBStorage:
         Returns:
             List of paper metadata.
         """
-        # Get all documents from the collection
-        collection = self.vector_store._collection
-        
-        # Get unique paper titles
-        results = collection.get(
-            include=["metadatas"],
-        )
-        
-        # Extract unique papers based on title
-        papers = {}
-        for metadata in results["metadatas"]:
-            if metadata and "title" in metadata:
-                title = metadata["title"]
-                if title not in papers:
-                    papers[title] = metadata
-                    
-        return list(papers.values())
+        # One row per title, in the order the papers were added
+        cursor = self.papers_db.execute(
+            f"SELECT {', '.join(_PAPERS_TABLE_COLUMNS[1:])} FROM papers "
+            "WHERE rowid IN (SELECT MIN(rowid) FROM papers GROUP BY title) "
+            "ORDER BY rowid"
+        )
+
+        return [
+            {
+                column: value
+                for column, value in zip(_PAPERS_TABLE_COLUMNS[1:], row)
+                if value is not None
+            }
+            for row in cursor
+        ]
 
     def delete_paper(self, title: str) -> None:
         """
@@ -149,13 +1158,55 @@ class VectorDBStorage:
         Args:
             title: Title of the paper to delete.
         """
-        # Get the collection
+        # Look up the chunk IDs instead of scanning the chunk metadata
+        chunk_ids = [
+            chunk_id
+            for chunk_id, in self.papers_db.execute(
+                "SELECT chunk_id FROM chunks JOIN papers USING (paper_key) "
+                "WHERE papers.title = ?",
+                (title,),
+            )
+        ]
+
         collection = self.vector_store._collection
-        
-        # Delete documents with matching title
-        collection.delete(
-            where={"title": title},
-        )
-        
-        # Persist the database
-        self.vector_store.persist()
\ No newline at end of file
+        batch_size = self.vector_store._client.max_batch_size
+        for start in range(0, len(chunk_ids), batch_size):
+            collection.delete(ids=chunk_ids[start : start + batch_size])
+
+        with self.papers_db:
+            self.papers_db.execute(
+                "DELETE FROM chunks WHERE paper_key IN "
+                "(SELECT paper_key FROM papers WHERE title = ?)",
+                (title,),
+            )
+            self.papers_db.execute("DELETE FROM papers WHERE title = ?", (title,))
+
+    def flush(self) -> None:
+        """
+        Write any buffered changes to disk.
+
+        Adding and deleting papers does not persist the database on every
+        call; flush once after a batch of changes instead.
+        """
+        self.vector_store.persist()
+
+    def close(self) -> None:
+        """
+        Flush the database and close the papers table and embedding cache.
+
+        Chroma keeps its client, which is shared by every storage opened on
+        the same directory, for the life of the process.
+        """
+        self.flush()
+        self.papers_db.close()
+
+        if self.embedding_cache is not None:
+            self.embedding_cache.cache.close()
+
+    def __enter__(self) -> "VectorDBStorage":
+        """Use the storage as a context manager that closes it on exit."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Flush and close the database when leaving the context."""
+        self.close()
@@ -1 +1 @@
-"""Test package for SyntopicalChat."""
\ No newline at end of file
+"""Test package for SyntopicalChat."""
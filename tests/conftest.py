@@ -1,41 +1,100 @@
 """Pytest configuration and fixtures for SyntopicalChat tests."""
 
+import hashlib
 import os
-import tempfile
+import shutil
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Dict, Generator, List
+from unittest.mock import MagicMock
 
+import numpy as np
 import pytest
-from pypdf import PdfWriter
+from langchain.schema.embeddings import Embeddings
+from pypdf import PdfReader, PdfWriter
 
-from syntopicalchat.pdf_processor.processor import PaperContent, PaperMetadata, PDFProcessor
-from syntopicalchat.vector_db.storage import VectorDBStorage
+# Import the CLI, and with it every heavy dependency, once per test process
+# rather than in whichever test first needs it
+import syntopicalchat.cli.main  # noqa: F401
+from syntopicalchat.llm import chat as llm_chat
 from syntopicalchat.llm.chat import SyntopicalChat
+from syntopicalchat.pdf_processor.processor import (
+    PaperContent,
+    PaperMetadata,
+    PDFProcessor,
+)
+from syntopicalchat.vector_db.storage import VectorDBStorage
 
+# Dimension of the stub embeddings, matching all-MiniLM-L6-v2; a multiple
+# of the 32-byte SHA-256 digests they are built from
+STUB_EMBEDDING_DIM = 384
 
-@pytest.fixture
-def temp_dir() -> Generator[Path, None, None]:
-    """Create a temporary directory for test files."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        yield Path(tmp_dir)
+
+class _StubEmbeddings(Embeddings):
+    """Deterministic unit-length embeddings derived from a hash of the text."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents in a single vectorized pass."""
+        digests = b"".join(hashlib.sha256(text.encode()).digest() for text in texts)
+        values = np.frombuffer(digests, dtype=np.uint8).reshape(-1, 32) - 127.5
+        values = np.tile(values, STUB_EMBEDDING_DIM // values.shape[1])
+        return (values / np.linalg.norm(values, axis=1, keepdims=True)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query."""
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _stub_embeddings() -> Generator[None, None, None]:
+    """Replace the embedding model with a stub, so tests never load a model."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(
+            VectorDBStorage,
+            "_create_embedding_function",
+            lambda self, model_name, backend: _StubEmbeddings(),
+        )
+        yield
+
+
+@pytest.fixture(autouse=True)
+def _no_real_openai(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    """Replace the OpenAI chat model with a mock, so tests never build a client."""
+    chat_openai = llm_chat.ChatOpenAI
+    monkeypatch.setattr(
+        llm_chat, "ChatOpenAI", lambda **kwargs: MagicMock(spec=chat_openai)
+    )
+
+    # Drop clients cached by other tests
+    llm_chat._get_llm.cache_clear()
+    yield
+    llm_chat._get_llm.cache_clear()
 
 
 @pytest.fixture
-def sample_pdf(temp_dir: Path) -> Path:
-    """Create a sample PDF file for testing."""
+def temp_dir(tmp_path: Path) -> Path:
+    """Create a temporary directory for test files, unique to each test worker."""
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def sample_pdf(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Create a sample PDF file shared by all tests; tests must not modify it."""
     # Create a simple PDF file
-    pdf_path = temp_dir / "test_paper.pdf"
-    
+    pdf_path = tmp_path_factory.mktemp("pdfs") / "test_paper.pdf"
+
     writer = PdfWriter()
-    
+
     # Add a page with title and content
     writer.add_blank_page(width=612, height=792)
-    writer.add_metadata({
-        "/Title": "Test Academic Paper",
-        "/Author": "Test Author 1, Test Author 2",
-        "/CreationDate": "D:20230101000000",
-    })
-    
+    writer.add_metadata(
+        {
+            "/Title": "Test Academic Paper",
+            "/Author": "Test Author 1, Test Author 2",
+            "/CreationDate": "D:20230101000000",
+        }
+    )
+
     # Add some text to the page
     page = writer.pages[0]
     content = """
@@ -70,14 +129,32 @@ def sample_pdf(temp_dir: Path) -> Path:
     1. Reference 1
     2. Reference 2
     """
-    
+
     # Write the PDF file
     with open(pdf_path, "wb") as f:
         writer.write(f)
-    
+
     return pdf_path
 
 
+@pytest.fixture
+def sample_pdf_copy(sample_pdf: Path, temp_dir: Path) -> Path:
+    """Copy the sample PDF into the test's own directory as a second file."""
+    return Path(shutil.copy(sample_pdf, temp_dir / "test_paper_copy.pdf"))
+
+
+@pytest.fixture(scope="session")
+def _cached_pdf_reader(sample_pdf: Path) -> PdfReader:
+    """Parse the sample PDF once for all tests."""
+    return PdfReader(sample_pdf)
+
+
+@pytest.fixture(scope="session")
+def _cached_pdf_text(sample_pdf: Path) -> str:
+    """Extract the text of the sample PDF once for all tests."""
+    return PDFProcessor().extract_text(sample_pdf)
+
+
 @pytest.fixture
 def pdf_processor() -> PDFProcessor:
     """Create a PDF processor instance for testing."""
@@ -113,11 +190,46 @@ def sample_paper_content(sample_paper_metadata: PaperMetadata) -> PaperContent:
     )
 
 
+@pytest.fixture(scope="session")
+def _pristine_db_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Initialize an empty vector database once, for tests to copy."""
+    db_path = tmp_path_factory.mktemp("pristine_db") / "test_db"
+    VectorDBStorage(persist_directory=db_path).close()
+    return db_path
+
+
+@pytest.fixture
+def db_path(_pristine_db_dir: Path, temp_dir: Path) -> Path:
+    """Provide an empty vector database directory of this test's own."""
+    # A plain copy rather than hard links, since SQLite writes its files in
+    # place and would otherwise change the pristine database
+    db_path = temp_dir / "test_db"
+    shutil.copytree(_pristine_db_dir, db_path)
+    return db_path
+
+
+@pytest.fixture
+def vector_db(db_path: Path) -> Generator[VectorDBStorage, None, None]:
+    """Create an empty vector database of this test's own."""
+    with VectorDBStorage(persist_directory=db_path) as vector_db:
+        yield vector_db
+
+
+@pytest.fixture
+def mock_paper_content() -> MagicMock:
+    """Create a mock of processed paper content titled "Test Paper"."""
+    paper_content = MagicMock()
+    paper_content.metadata.title = "Test Paper"
+    return paper_content
+
+
 @pytest.fixture
-def vector_db(temp_dir: Path) -> VectorDBStorage:
-    """Create a vector database instance for testing."""
-    db_path = temp_dir / "test_chroma_db"
-    return VectorDBStorage(persist_directory=db_path)
+def mock_chat_response() -> Dict:
+    """Create a mock chat response citing "Test Paper"."""
+    return {
+        "answer": "This is a test answer.",
+        "source_documents": [SimpleNamespace(metadata={"title": "Test Paper"})],
+    }
 
 
 @pytest.fixture
@@ -150,4 +262,4 @@ def mock_arxiv_response() -> List[Dict]:
             "arxiv_id": "8765.4321v1",
             "categories": ["cs.CL", "cs.AI"],
         },
-    ]
\ No newline at end of file
+    ]
@@ -6,7 +6,11 @@ from pathlib import Path
 import pytest
 
 from syntopicalchat import __version__
-from syntopicalchat.pdf_processor.processor import PDFProcessor, PaperMetadata, PaperContent
+from syntopicalchat.pdf_processor.processor import (
+    PaperContent,
+    PaperMetadata,
+    PDFProcessor,
+)
 from syntopicalchat.vector_db.storage import VectorDBStorage
 
 
@@ -52,9 +56,9 @@ def test_pdf_processor():
     """Test that PDFProcessor can process a PDF file."""
     processor = PDFProcessor()
     assert processor is not None
-    
+
     # This test requires a test PDF file to be present
     if os.path.exists("data/test.pdf"):
         content = processor.process_pdf(Path("data/test.pdf"))
         assert content.metadata.title is not None
-        assert content.text is not None
\ No newline at end of file
+        assert content.text is not None
@@ -1,347 +1,385 @@
 """Tests for the CLI interface."""
 
-import pytest
+import re
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 
+import click
+import pytest
 import typer
-from typer.testing import CliRunner
+from click.testing import CliRunner
 
+from syntopicalchat.arxiv_integration.arxiv_client import ArxivClient
+from syntopicalchat.cli.main import analyze as analyze_cmd
 from syntopicalchat.cli.main import app
-from syntopicalchat.pdf_processor.processor import PDFProcessor
-from syntopicalchat.vector_db.storage import VectorDBStorage
+from syntopicalchat.cli.main import list as list_cmd
+from syntopicalchat.cli.main import upload as upload_cmd
 from syntopicalchat.llm.chat import SyntopicalChat
-from syntopicalchat.arxiv_integration.arxiv_client import ArxivClient
+from syntopicalchat.pdf_processor.processor import PDFProcessor, pdf_sha256
+from syntopicalchat.vector_db.storage import VectorDBStorage
 
+# Chat session input: one question, then exit
+CHAT_INPUT = "What is the main topic?\nexit\n"
 
-@pytest.fixture
-def cli_runner():
-    """Create a CLI runner for testing."""
+# Expected output of each command, in order
+CHAT_OUTPUT_RE = re.compile(
+    r"Welcome to SyntopicalChat.*This is a test answer.*Sources.*Test Paper.*Goodbye",
+    re.S,
+)
+START_FOLDER_OUTPUT_RE = re.compile(
+    r"Welcome to SyntopicalChat.*Processing papers.*Successfully processed Test Paper"
+    r".*Processing complete.*This is a test answer.*Goodbye",
+    re.S,
+)
+START_ARXIV_OUTPUT_RE = re.compile(
+    r"Welcome to SyntopicalChat.*Searching Arxiv.*Downloaded.*Processing papers"
+    r".*Processing complete.*This is a test answer.*Goodbye",
+    re.S,
+)
+
+
+@pytest.fixture(scope="session")
+def cli_runner() -> CliRunner:
+    """Create a CLI runner shared by all tests."""
     return CliRunner()
 
 
+@pytest.fixture(scope="session")
+def cli_command() -> click.Command:
+    """Convert the Typer app to a Click command once for all tests."""
+    return typer.main.get_command(app)
+
+
 @pytest.mark.unit
-def test_app_callback(cli_runner):
+def test_app_callback(cli_runner, cli_command):
     """Test the app callback function."""
-    result = cli_runner.invoke(app, ["--help"])
+    result = cli_runner.invoke(cli_command, ["--help"])
     assert result.exit_code == 0
     assert "SyntopicalChat" in result.stdout
     assert "analyze academic papers" in result.stdout.lower()
 
 
 @pytest.mark.unit
-def test_upload_command(cli_runner, sample_pdf, temp_dir):
+def test_upload_command(
+    cli_runner, cli_command, sample_pdf, db_path, mock_paper_content, monkeypatch
+):
     """Test the upload command."""
-    with patch.object(PDFProcessor, "process_pdf") as mock_process_pdf, \
-         patch.object(VectorDBStorage, "add_paper") as mock_add_paper:
-        # Mock the process_pdf method
-        mock_paper_content = MagicMock()
-        mock_paper_content.metadata.title = "Test Paper"
-        mock_process_pdf.return_value = mock_paper_content
-        
-        # Mock the add_paper method
-        mock_add_paper.return_value = ["test-paper-0"]
-        
-        # Run the command
-        result = cli_runner.invoke(
-            app, 
-            ["upload", str(sample_pdf), "--db-path", str(temp_dir / "test_db")]
-        )
-        
-        # Verify the result
-        assert result.exit_code == 0
-        assert "Uploading PDF files" in result.stdout
-        assert "Successfully processed Test Paper" in result.stdout
-        assert "Upload complete" in result.stdout
-        
-        # Verify the method calls
-        mock_process_pdf.assert_called_once_with(sample_pdf)
-        mock_add_paper.assert_called_once_with(mock_paper_content)
+    mock_process_pdf = MagicMock()
+    monkeypatch.setattr(PDFProcessor, "process_pdf", mock_process_pdf)
+    mock_add_papers = MagicMock()
+    monkeypatch.setattr(VectorDBStorage, "add_papers", mock_add_papers)
+
+    # Mock the process_pdf method
+    mock_process_pdf.return_value = mock_paper_content
+
+    # Mock the add_papers method
+    mock_add_papers.return_value = ["test-paper-0"]
+
+    # Run the command
+    result = cli_runner.invoke(
+        cli_command, ["upload", str(sample_pdf), "--db-path", str(db_path)]
+    )
+
+    # Verify the result
+    assert result.exit_code == 0
+    assert "Uploading PDF files" in result.stdout
+    assert "Successfully processed Test Paper" in result.stdout
+    assert "Upload complete" in result.stdout
+
+    # Verify the method calls
+    mock_process_pdf.assert_called_once_with(sample_pdf, pdf_sha256(sample_pdf))
+    mock_add_papers.assert_called_once_with([mock_paper_content])
 
 
 @pytest.mark.unit
-def test_list_command(cli_runner, temp_dir):
+def test_upload_command_skips_duplicates(
+    cli_runner, cli_command, sample_pdf, db_path, monkeypatch
+):
+    """Test that the upload command skips papers already in the database."""
+    mock_has_document = MagicMock()
+    monkeypatch.setattr(VectorDBStorage, "has_document", mock_has_document)
+    mock_process_pdf = MagicMock()
+    monkeypatch.setattr(PDFProcessor, "process_pdf", mock_process_pdf)
+    mock_add_papers = MagicMock()
+    monkeypatch.setattr(VectorDBStorage, "add_papers", mock_add_papers)
+
+    # Mock the has_document method to report the paper as present
+    mock_has_document.return_value = True
+
+    # Run the command
+    result = cli_runner.invoke(
+        cli_command, ["upload", str(sample_pdf), "--db-path", str(db_path)]
+    )
+
+    # Verify the result
+    assert result.exit_code == 0
+    assert "already in the database" in result.stdout
+
+    # Verify the paper was neither processed nor added
+    mock_process_pdf.assert_not_called()
+    mock_add_papers.assert_not_called()
+
+
+@pytest.mark.unit
+def test_list_command(cli_runner, cli_command, db_path, monkeypatch):
     """Test the list command."""
-    with patch.object(VectorDBStorage, "get_all_papers") as mock_get_all_papers:
-        # Mock the get_all_papers method
-        mock_get_all_papers.return_value = [
-            {
-                "title": "Test Paper 1",
-                "authors": "Author 1, Author 2",
-                "publication_date": "2023-01-01",
-            },
-            {
-                "title": "Test Paper 2",
-                "authors": "Author 3, Author 4",
-                "publication_date": "2023-01-02",
-            },
-        ]
-        
-        # Run the command
-        result = cli_runner.invoke(
-            app, 
-            ["list", "--db-path", str(temp_dir / "test_db")]
-        )
-        
-        # Verify the result
-        assert result.exit_code == 0
-        assert "Listing uploaded papers" in result.stdout
-        assert "Test Paper 1" in result.stdout
-        assert "Test Paper 2" in result.stdout
-        assert "Author 1, Author 2" in result.stdout
-        assert "Author 3, Author 4" in result.stdout
-        
-        # Verify the method calls
-        mock_get_all_papers.assert_called_once()
+    mock_get_all_papers = MagicMock()
+    monkeypatch.setattr(VectorDBStorage, "get_all_papers", mock_get_all_papers)
+
+    # Mock the get_all_papers method
+    mock_get_all_papers.return_value = [
+        {
+            "title": "Test Paper 1",
+            "authors": "Author 1, Author 2",
+            "publication_date": "2023-01-01",
+        },
+        {
+            "title": "Test Paper 2",
+            "authors": "Author 3, Author 4",
+            "publication_date": "2023-01-02",
+        },
+    ]
+
+    # Run the command
+    result = cli_runner.invoke(cli_command, ["list", "--db-path", str(db_path)])
+
+    # Verify the result
+    assert result.exit_code == 0
+    assert "Listing uploaded papers" in result.stdout
+    assert "Test Paper 1" in result.stdout
+    assert "Test Paper 2" in result.stdout
+    assert "Author 1, Author 2" in result.stdout
+    assert "Author 3, Author 4" in result.stdout
+
+    # Verify the method calls
+    mock_get_all_papers.assert_called_once()
 
 
 @pytest.mark.unit
-def test_chat_command(cli_runner, temp_dir, mock_openai_env):
+def test_chat_command(
+    cli_runner, cli_command, db_path, mock_openai_env, mock_chat_response, monkeypatch
+):
     """Test the chat command."""
-    with patch.object(SyntopicalChat, "chat") as mock_chat, \
-         patch.object(typer, "prompt") as mock_prompt:
-        # Mock the chat method
-        mock_chat.return_value = {
-            "answer": "This is a test answer.",
-            "source_documents": [
-                MagicMock(metadata={"title": "Test Paper"})
-            ]
-        }
-        
-        # Mock the prompt method to first return a question, then exit
-        mock_prompt.side_effect = ["What is the main topic?", "exit"]
-        
-        # Run the command
-        result = cli_runner.invoke(
-            app, 
-            ["chat", "--db-path", str(temp_dir / "test_db")]
-        )
-        
-        # Verify the result
-        assert result.exit_code == 0
-        assert "Welcome to SyntopicalChat" in result.stdout
-        assert "This is a test answer" in result.stdout
-        assert "Sources" in result.stdout
-        assert "Test Paper" in result.stdout
-        assert "Goodbye" in result.stdout
-        
-        # Verify the method calls
-        mock_chat.assert_called_once_with("What is the main topic?")
-        assert mock_prompt.call_count == 2
+    mock_chat = MagicMock()
+    monkeypatch.setattr(SyntopicalChat, "chat", mock_chat)
+
+    # Mock the chat method
+    mock_chat.return_value = mock_chat_response
+
+    # Run the command
+    result = cli_runner.invoke(
+        cli_command,
+        ["chat", "--db-path", str(db_path)],
+        input=CHAT_INPUT,
+    )
+
+    # Verify the result
+    assert result.exit_code == 0
+    assert CHAT_OUTPUT_RE.search(result.stdout)
+
+    # Verify the method calls
+    mock_chat.assert_called_once_with("What is the main topic?")
 
 
 @pytest.mark.unit
-def test_analyze_command(cli_runner, temp_dir, mock_openai_env):
+def test_analyze_command(
+    cli_runner, cli_command, db_path, mock_openai_env, mock_chat_response, monkeypatch
+):
     """Test the analyze command."""
-    with patch.object(SyntopicalChat, "analyze_topic") as mock_analyze_topic:
-        # Mock the analyze_topic method
-        mock_analyze_topic.return_value = {
-            "answer": "This is a test analysis.",
-            "source_documents": [
-                MagicMock(metadata={"title": "Test Paper"})
-            ]
-        }
-        
-        # Run the command
-        result = cli_runner.invoke(
-            app, 
-            ["analyze", "quantum computing", "--db-path", str(temp_dir / "test_db")]
-        )
-        
-        # Verify the result
-        assert result.exit_code == 0
-        assert "Performing syntopical analysis" in result.stdout
-        assert "This is a test analysis" in result.stdout
-        assert "Sources" in result.stdout
-        assert "Test Paper" in result.stdout
-        
-        # Verify the method calls
-        mock_analyze_topic.assert_called_once_with("quantum computing")
+    mock_analyze_topic = MagicMock()
+    monkeypatch.setattr(SyntopicalChat, "analyze_topic", mock_analyze_topic)
 
+    # Mock the analyze_topic method
+    mock_analyze_topic.return_value = {
+        **mock_chat_response,
+        "answer": "This is a test analysis.",
+    }
 
-@pytest.mark.unit
-def test_start_command_folder_option(cli_runner, temp_dir, mock_openai_env):
-    """Test the start command with folder option."""
-    with patch("rich.prompt.Prompt.ask") as mock_ask, \
-         patch("pathlib.Path.glob") as mock_glob, \
-         patch.object(PDFProcessor, "process_pdf") as mock_process_pdf, \
-         patch.object(VectorDBStorage, "add_paper") as mock_add_paper, \
-         patch.object(SyntopicalChat, "chat") as mock_chat, \
-         patch.object(typer, "prompt") as mock_prompt:
-        # Mock the ask method to choose folder option
-        mock_ask.return_value = "folder"
-        
-        # Mock the glob method to return sample PDFs
-        sample_pdf = temp_dir / "test_paper.pdf"
-        mock_glob.return_value = [sample_pdf]
-        
-        # Mock the process_pdf method
-        mock_paper_content = MagicMock()
-        mock_paper_content.metadata.title = "Test Paper"
-        mock_process_pdf.return_value = mock_paper_content
-        
-        # Mock the add_paper method
-        mock_add_paper.return_value = ["test-paper-0"]
-        
-        # Mock the chat method
-        mock_chat.return_value = {
-            "answer": "This is a test answer.",
-            "source_documents": [
-                MagicMock(metadata={"title": "Test Paper"})
-            ]
-        }
-        
-        # Mock the prompt method to exit after one question
-        mock_prompt.side_effect = ["What is the main topic?", "exit"]
-        
-        # Run the command
-        result = cli_runner.invoke(
-            app, 
-            ["start", "--db-path", str(temp_dir / "test_db")]
-        )
-        
-        # Verify the result
-        assert result.exit_code == 0
-        assert "Welcome to SyntopicalChat" in result.stdout
-        assert "Processing papers" in result.stdout
-        assert "Successfully processed Test Paper" in result.stdout
-        assert "Processing complete" in result.stdout
-        assert "This is a test answer" in result.stdout
-        assert "Goodbye" in result.stdout
+    # Run the command
+    result = cli_runner.invoke(
+        cli_command, ["analyze", "quantum computing", "--db-path", str(db_path)]
+    )
+
+    # Verify the result
+    assert result.exit_code == 0
+    assert "Performing syntopical analysis" in result.stdout
+    assert "This is a test analysis" in result.stdout
+    assert "Sources" in result.stdout
+    assert "Test Paper" in result.stdout
+
+    # Verify the method calls
+    mock_analyze_topic.assert_called_once_with("quantum computing")
+
+
+@pytest.fixture
+def folder_source(temp_dir):
+    """Create a folder of PDFs to load in the start command."""
+    pdf_dir = temp_dir / "pdfs"
+    pdf_dir.mkdir()
+    pdf_path = pdf_dir / "test_paper.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 test paper")
+    (pdf_dir / "notes.txt").write_text("not a pdf")
+
+    # Answers to the prompts, and the title of each PDF
+    return ["folder", str(pdf_dir)], {pdf_path: "Test Paper"}
+
+
+@pytest.fixture
+def arxiv_source(temp_dir, mock_arxiv_response, monkeypatch):
+    """Mock an Arxiv search to load in the start command."""
+    monkeypatch.setattr("rich.prompt.IntPrompt.ask", MagicMock(return_value=2))
+
+    pdf_paths = [temp_dir / f"{paper['arxiv_id']}.pdf" for paper in mock_arxiv_response]
+    for pdf_path in pdf_paths:
+        pdf_path.write_bytes(f"%PDF-1.4 {pdf_path.stem}".encode())
+    monkeypatch.setattr(
+        ArxivClient,
+        "search_and_download",
+        MagicMock(return_value=list(zip(mock_arxiv_response, pdf_paths))),
+    )
+
+    # Answers to the prompts, and the title of each PDF
+    titles = {
+        pdf_path: paper["title"]
+        for paper, pdf_path in zip(mock_arxiv_response, pdf_paths)
+    }
+    return ["arxiv", "quantum computing"], titles
 
 
 @pytest.mark.unit
-def test_start_command_arxiv_option(cli_runner, temp_dir, mock_openai_env, mock_arxiv_response):
-    """Test the start command with arxiv option."""
-    with patch("rich.prompt.Prompt.ask") as mock_ask, \
-         patch("rich.prompt.IntPrompt.ask") as mock_int_ask, \
-         patch.object(ArxivClient, "search_and_download") as mock_search_and_download, \
-         patch.object(PDFProcessor, "process_pdf") as mock_process_pdf, \
-         patch.object(VectorDBStorage, "add_paper") as mock_add_paper, \
-         patch.object(SyntopicalChat, "chat") as mock_chat, \
-         patch.object(typer, "prompt") as mock_prompt:
-        # Mock the ask method to choose arxiv option and query
-        mock_ask.side_effect = ["arxiv", "quantum computing"]
-        
-        # Mock the int_ask method to return max results
-        mock_int_ask.return_value = 2
-        
-        # Mock the search_and_download method
-        pdf_paths = [temp_dir / f"{paper['arxiv_id']}.pdf" for paper in mock_arxiv_response]
-        mock_search_and_download.return_value = list(zip(mock_arxiv_response, pdf_paths))
-        
-        # Mock the process_pdf method
-        mock_paper_contents = []
-        for i, paper in enumerate(mock_arxiv_response):
-            mock_paper_content = MagicMock()
-            mock_paper_content.metadata.title = paper["title"]
-            mock_paper_contents.append(mock_paper_content)
-        mock_process_pdf.side_effect = mock_paper_contents
-        
-        # Mock the add_paper method
-        mock_add_paper.side_effect = [["paper-1-0"], ["paper-2-0"]]
-        
-        # Mock the chat method
-        mock_chat.return_value = {
-            "answer": "This is a test answer.",
-            "source_documents": [
-                MagicMock(metadata={"title": "Test Paper 1"})
-            ]
-        }
-        
-        # Mock the prompt method to exit after one question
-        mock_prompt.side_effect = ["What is the main topic?", "exit"]
-        
-        # Run the command
-        result = cli_runner.invoke(
-            app, 
-            ["start", "--db-path", str(temp_dir / "test_db")]
-        )
-        
-        # Verify the result
-        assert result.exit_code == 0
-        assert "Welcome to SyntopicalChat" in result.stdout
-        assert "Searching Arxiv" in result.stdout
-        assert "Downloaded" in result.stdout
-        assert "Processing papers" in result.stdout
-        assert "Processing complete" in result.stdout
-        assert "This is a test answer" in result.stdout
-        assert "Goodbye" in result.stdout
+@pytest.mark.parametrize(
+    "source, output_re",
+    [
+        ("folder_source", START_FOLDER_OUTPUT_RE),
+        ("arxiv_source", START_ARXIV_OUTPUT_RE),
+    ],
+    ids=["folder", "arxiv"],
+)
+def test_start_command(
+    source,
+    output_re,
+    request,
+    cli_runner,
+    cli_command,
+    db_path,
+    mock_openai_env,
+    mock_chat_response,
+    monkeypatch,
+):
+    """Test the start command with the folder and arxiv options."""
+    mock_ask = MagicMock()
+    monkeypatch.setattr("rich.prompt.Prompt.ask", mock_ask)
+    mock_process_pdf = MagicMock()
+    monkeypatch.setattr(PDFProcessor, "process_pdf", mock_process_pdf)
+    mock_add_papers = MagicMock()
+    monkeypatch.setattr(VectorDBStorage, "add_papers", mock_add_papers)
+    mock_chat = MagicMock()
+    monkeypatch.setattr(SyntopicalChat, "chat", mock_chat)
+
+    # Mock the ask method to choose the source of the papers
+    answers, titles = request.getfixturevalue(source)
+    mock_ask.side_effect = answers
+
+    # Mock the process_pdf method
+    mock_paper_contents = {}
+    for pdf_path, title in titles.items():
+        mock_paper_contents[pdf_path] = MagicMock()
+        mock_paper_contents[pdf_path].metadata.title = title
+    mock_process_pdf.side_effect = mock_paper_contents.get
+
+    # Mock the add_papers method
+    mock_add_papers.return_value = [f"paper-{i}-0" for i in range(len(titles))]
+
+    # Mock the chat method
+    mock_chat.return_value = mock_chat_response
+
+    # Run the command, parsing in-process so the mocks apply
+    result = cli_runner.invoke(
+        cli_command,
+        ["start", "--db-path", str(db_path), "--workers", "1"],
+        input=CHAT_INPUT,
+    )
+
+    # Verify the result
+    assert result.exit_code == 0
+    assert output_re.search(result.stdout)
+
+    # Verify only the PDFs from the source were processed, and added in a single batch
+    assert [call.args[0] for call in mock_process_pdf.call_args_list] == list(titles)
+    mock_add_papers.assert_called_once_with(list(mock_paper_contents.values()))
 
 
 @pytest.mark.integration
-def test_end_to_end_cli(cli_runner, sample_pdf, temp_dir, mock_openai_env):
+@pytest.mark.serial
+def test_end_to_end_cli(
+    cli_runner,
+    cli_command,
+    sample_pdf,
+    db_path,
+    mock_openai_env,
+    mock_paper_content,
+    mock_chat_response,
+    monkeypatch,
+    capsys,
+):
     """Test end-to-end CLI functionality."""
-    with patch.object(PDFProcessor, "process_pdf") as mock_process_pdf, \
-         patch.object(VectorDBStorage, "add_paper") as mock_add_paper, \
-         patch.object(VectorDBStorage, "get_all_papers") as mock_get_all_papers, \
-         patch.object(SyntopicalChat, "chat") as mock_chat, \
-         patch.object(SyntopicalChat, "analyze_topic") as mock_analyze_topic, \
-         patch.object(typer, "prompt") as mock_prompt:
-        # Mock the process_pdf method
-        mock_paper_content = MagicMock()
-        mock_paper_content.metadata.title = "Test Paper"
-        mock_process_pdf.return_value = mock_paper_content
-        
-        # Mock the add_paper method
-        mock_add_paper.return_value = ["test-paper-0"]
-        
-        # Mock the get_all_papers method
-        mock_get_all_papers.return_value = [
-            {
-                "title": "Test Paper",
-                "authors": "Author 1, Author 2",
-                "publication_date": "2023-01-01",
-            }
-        ]
-        
-        # Mock the chat method
-        mock_chat.return_value = {
-            "answer": "This is a test answer.",
-            "source_documents": [
-                MagicMock(metadata={"title": "Test Paper"})
-            ]
-        }
-        
-        # Mock the analyze_topic method
-        mock_analyze_topic.return_value = {
-            "answer": "This is a test analysis.",
-            "source_documents": [
-                MagicMock(metadata={"title": "Test Paper"})
-            ]
+    mock_process_pdf = MagicMock()
+    monkeypatch.setattr(PDFProcessor, "process_pdf", mock_process_pdf)
+    mock_add_papers = MagicMock()
+    monkeypatch.setattr(VectorDBStorage, "add_papers", mock_add_papers)
+    mock_get_all_papers = MagicMock()
+    monkeypatch.setattr(VectorDBStorage, "get_all_papers", mock_get_all_papers)
+    mock_chat = MagicMock()
+    monkeypatch.setattr(SyntopicalChat, "chat", mock_chat)
+    mock_analyze_topic = MagicMock()
+    monkeypatch.setattr(SyntopicalChat, "analyze_topic", mock_analyze_topic)
+
+    # Mock the process_pdf method
+    mock_process_pdf.return_value = mock_paper_content
+
+    # Mock the add_papers method
+    mock_add_papers.return_value = ["test-paper-0"]
+
+    # Mock the get_all_papers method
+    mock_get_all_papers.return_value = [
+        {
+            "title": "Test Paper",
+            "authors": "Author 1, Author 2",
+            "publication_date": "2023-01-01",
         }
-        
-        # Mock the prompt method to exit after one question
-        mock_prompt.side_effect = ["What is the main topic?", "exit"]
-        
-        # Run the upload command
-        upload_result = cli_runner.invoke(
-            app, 
-            ["upload", str(sample_pdf), "--db-path", str(temp_dir / "test_db")]
-        )
-        assert upload_result.exit_code == 0
-        assert "Successfully processed Test Paper" in upload_result.stdout
-        
-        # Run the list command
-        list_result = cli_runner.invoke(
-            app, 
-            ["list", "--db-path", str(temp_dir / "test_db")]
-        )
-        assert list_result.exit_code == 0
-        assert "Test Paper" in list_result.stdout
-        
-        # Run the analyze command
-        analyze_result = cli_runner.invoke(
-            app, 
-            ["analyze", "quantum computing", "--db-path", str(temp_dir / "test_db")]
-        )
-        assert analyze_result.exit_code == 0
-        assert "This is a test analysis" in analyze_result.stdout
-        
-        # Run the chat command
-        chat_result = cli_runner.invoke(
-            app, 
-            ["chat", "--db-path", str(temp_dir / "test_db")]
-        )
-        assert chat_result.exit_code == 0
-        assert "This is a test answer" in chat_result.stdout
\ No newline at end of file
+    ]
+
+    # Mock the chat method
+    mock_chat.return_value = mock_chat_response
+
+    # Mock the analyze_topic method
+    mock_analyze_topic.return_value = {
+        **mock_chat_response,
+        "answer": "This is a test analysis.",
+    }
+
+    # Run the upload, list and analyze commands as plain functions
+    upload_cmd(
+        pdf_paths=[sample_pdf], db_path=db_path, workers=None, embedding_backend="fp32"
+    )
+    assert "Successfully processed Test Paper" in capsys.readouterr().out
+
+    list_cmd(db_path=db_path)
+    assert "Test Paper" in capsys.readouterr().out
+
+    analyze_cmd(
+        topic="quantum computing",
+        db_path=db_path,
+        model="gpt-3.5-turbo",
+        embedding_backend="fp32",
+    )
+    assert "This is a test analysis" in capsys.readouterr().out
+
+    # Run the chat command through the CLI, covering argument parsing and input
+    chat_result = cli_runner.invoke(
+        cli_command,
+        ["chat", "--db-path", str(db_path)],
+        input=CHAT_INPUT,
+    )
+    assert chat_result.exit_code == 0
+    assert CHAT_OUTPUT_RE.search(chat_result.stdout)
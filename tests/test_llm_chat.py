@@ -1,201 +1,268 @@
 """Tests for the LLM Chat module."""
 
-import pytest
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import MagicMock
 
+import pytest
+from freezegun import freeze_time
 from langchain.schema import Document
-from syntopicalchat.llm.chat import SyntopicalChat
+
+from syntopicalchat.llm.chat import (
+    _SYNTOPIC_PROMPT,
+    CrossEncoderReranker,
+    SyntopicalChat,
+)
+
+
+@pytest.fixture(autouse=True)
+def _frozen_time():
+    """Pin the clock while chats are built and used."""
+    with freeze_time("2024-01-01"):
+        yield
+
+
+@pytest.fixture
+def stub_memory(monkeypatch):
+    """Replace the conversation memory with a lightweight stub."""
+    memory = SimpleNamespace(
+        clear=MagicMock(),
+        load_memory_variables=lambda inputs: {"chat_history": []},
+        save_context=lambda *args, **kwargs: None,
+    )
+    monkeypatch.setattr(
+        "syntopicalchat.llm.chat.ConversationBufferMemory", lambda **kwargs: memory
+    )
+    return memory
 
 
 @pytest.mark.unit
 def test_syntopical_chat_initialization(vector_db, mock_openai_env):
     """Test that SyntopicalChat can be initialized."""
-    with patch("langchain_openai.ChatOpenAI") as mock_chat_openai:
-        # Mock the ChatOpenAI class
-        mock_chat_openai.return_value = MagicMock()
-        
-        # Initialize SyntopicalChat
-        chat = SyntopicalChat(vector_db=vector_db)
-        
-        # Verify the initialization
-        assert chat is not None
-        assert chat.vector_db == vector_db
-        assert chat.llm is not None
-        assert chat.memory is not None
-        assert chat.chain is not None
+    # Initialize SyntopicalChat
+    chat = SyntopicalChat(vector_db=vector_db)
+
+    # Verify the initialization
+    assert chat is not None
+    assert chat.vector_db == vector_db
+    assert chat.llm is not None
+    assert chat.memory is not None
+    assert chat.chain is not None
 
 
 @pytest.mark.unit
-def test_create_chain(vector_db, mock_openai_env):
+def test_create_chain(vector_db, mock_openai_env, monkeypatch):
     """Test creating a conversational retrieval chain."""
-    with patch("langchain_openai.ChatOpenAI") as mock_chat_openai, \
-         patch("langchain.chains.ConversationalRetrievalChain.from_llm") as mock_from_llm:
-        # Mock the ChatOpenAI class
-        mock_chat_openai.return_value = MagicMock()
-        
-        # Mock the from_llm method
-        mock_chain = MagicMock()
-        mock_from_llm.return_value = mock_chain
-        
-        # Initialize SyntopicalChat
-        chat = SyntopicalChat(vector_db=vector_db)
-        
-        # Call the _create_chain method
-        chain = chat._create_chain()
-        
-        # Verify the chain creation
-        assert chain is mock_chain
-        mock_from_llm.assert_called_once()
+    mock_from_llm = MagicMock()
+    monkeypatch.setattr(
+        "langchain.chains.ConversationalRetrievalChain.from_llm", mock_from_llm
+    )
+
+    # Mock the from_llm method
+    mock_chain = MagicMock()
+    mock_from_llm.return_value = mock_chain
+
+    # Initialize SyntopicalChat
+    chat = SyntopicalChat(vector_db=vector_db)
+
+    # Call the _create_chain method
+    chain = chat._create_chain()
+
+    # Verify the chain creation
+    assert chain is mock_chain
+    mock_from_llm.assert_called_once()
 
 
 @pytest.mark.unit
-def test_enhance_query(vector_db, mock_openai_env):
-    """Test enhancing a query with syntopical analysis context."""
-    with patch("langchain_openai.ChatOpenAI") as mock_chat_openai:
-        # Mock the ChatOpenAI class
-        mock_chat_openai.return_value = MagicMock()
-        
-        # Initialize SyntopicalChat
-        chat = SyntopicalChat(vector_db=vector_db)
-        
-        # Enhance a query
-        query = "What is the main topic?"
-        enhanced_query = chat._enhance_query(query)
-        
-        # Verify the enhanced query
-        assert query in enhanced_query
-        assert "syntopical analysis" in enhanced_query.lower()
-        assert "perspectives" in enhanced_query.lower()
-        assert "methodologies" in enhanced_query.lower()
+def test_create_retriever(vector_db, mock_openai_env):
+    """Test that retrieved chunks are reranked unless reranking is disabled."""
+    # Initialize SyntopicalChat with and without a rerank model
+    chat = SyntopicalChat(vector_db=vector_db, fetch_k=10, top_k=3)
+    plain_chat = SyntopicalChat(vector_db=vector_db, rerank_model=None, top_k=3)
+
+    # Verify the retrievers
+    retriever = chat._create_retriever()
+    assert retriever.base_retriever.search_kwargs == {"k": 10}
+    assert retriever.base_compressor.top_n == 3
+    assert plain_chat._create_retriever().search_kwargs == {"k": 3}
 
 
 @pytest.mark.unit
-def test_chat(vector_db, mock_openai_env):
+def test_cross_encoder_reranker(monkeypatch):
+    """Test reranking documents with a cross-encoder."""
+    documents = [
+        Document(page_content="Unrelated content"),
+        Document(page_content="Highly relevant content"),
+        Document(page_content="Somewhat relevant content"),
+    ]
+
+    mock_get_cross_encoder = MagicMock()
+    monkeypatch.setattr(
+        "syntopicalchat.llm.chat._get_cross_encoder", mock_get_cross_encoder
+    )
+
+    # Mock the cross-encoder scores
+    mock_get_cross_encoder.return_value.predict.return_value = [0.1, 0.9, 0.5]
+
+    reranker = CrossEncoderReranker(top_n=2)
+    reranked = reranker.compress_documents(documents, "What is relevant?")
+
+    # Verify all documents are scored in one batch and the best are kept
+    mock_get_cross_encoder.return_value.predict.assert_called_once()
+    assert [doc.page_content for doc in reranked] == [
+        "Highly relevant content",
+        "Somewhat relevant content",
+    ]
+
+    # Verify that no documents means no scoring
+    assert reranker.compress_documents([], "What is relevant?") == []
+
+
+@pytest.mark.unit
+def test_syntopic_prompt():
+    """Test that the answer prompt adds syntopical analysis context."""
+    query = "What is the main topic?"
+    prompt = _SYNTOPIC_PROMPT.format(context="Test content", question=query)
+
+    # Verify the prompt
+    assert query in prompt
+    assert "Test content" in prompt
+    assert "syntopical analysis" in prompt.lower()
+    assert "perspectives" in prompt.lower()
+    assert "methodologies" in prompt.lower()
+
+
+@pytest.mark.unit
+def test_chat(vector_db, mock_openai_env, stub_memory, monkeypatch):
     """Test chatting with the language model."""
-    with patch("langchain_openai.ChatOpenAI") as mock_chat_openai, \
-         patch("langchain.chains.ConversationalRetrievalChain.from_llm") as mock_from_llm:
-        # Mock the ChatOpenAI class
-        mock_chat_openai.return_value = MagicMock()
-        
-        # Mock the chain
-        mock_chain = MagicMock()
-        mock_chain.return_value = {
-            "answer": "This is a test answer.",
-            "source_documents": [
-                Document(page_content="Test content", metadata={"title": "Test Paper"})
-            ]
-        }
-        mock_from_llm.return_value = mock_chain
-        
-        # Initialize SyntopicalChat
-        chat = SyntopicalChat(vector_db=vector_db)
-        
-        # Chat with the model
-        response = chat.chat("What is the main topic?")
-        
-        # Verify the response
-        assert "answer" in response
-        assert response["answer"] == "This is a test answer."
-        assert "source_documents" in response
-        assert len(response["source_documents"]) == 1
-        assert response["source_documents"][0].metadata["title"] == "Test Paper"
+    mock_from_llm = MagicMock()
+    monkeypatch.setattr(
+        "langchain.chains.ConversationalRetrievalChain.from_llm", mock_from_llm
+    )
+
+    # Mock the chain
+    mock_chain = MagicMock()
+    mock_chain.return_value = {
+        "answer": "This is a test answer.",
+        "source_documents": [
+            Document(page_content="Test content", metadata={"title": "Test Paper"})
+        ],
+    }
+    mock_from_llm.return_value = mock_chain
+
+    # Initialize SyntopicalChat
+    chat = SyntopicalChat(vector_db=vector_db)
+
+    # Chat with the model
+    response = chat.chat("What is the main topic?")
+
+    # Verify the raw question is passed to the chain
+    mock_chain.assert_called_once_with({"question": "What is the main topic?"})
+
+    # Verify the response
+    assert "answer" in response
+    assert response["answer"] == "This is a test answer."
+    assert "source_documents" in response
+    assert len(response["source_documents"]) == 1
+    assert response["source_documents"][0].metadata["title"] == "Test Paper"
 
 
 @pytest.mark.unit
-def test_analyze_topic(vector_db, mock_openai_env):
+def test_analyze_topic(vector_db, mock_openai_env, stub_memory, monkeypatch):
     """Test analyzing a topic."""
-    with patch("langchain_openai.ChatOpenAI") as mock_chat_openai, \
-         patch("langchain.chains.ConversationalRetrievalChain.from_llm") as mock_from_llm:
-        # Mock the ChatOpenAI class
-        mock_chat_openai.return_value = MagicMock()
-        
-        # Mock the chain
-        mock_chain = MagicMock()
-        mock_chain.return_value = {
-            "answer": "This is a test analysis.",
-            "source_documents": [
-                Document(page_content="Test content", metadata={"title": "Test Paper"})
-            ]
-        }
-        mock_from_llm.return_value = mock_chain
-        
-        # Initialize SyntopicalChat
-        chat = SyntopicalChat(vector_db=vector_db)
-        
-        # Analyze a topic
-        response = chat.analyze_topic("quantum computing")
-        
-        # Verify the response
-        assert "answer" in response
-        assert response["answer"] == "This is a test analysis."
-        assert "source_documents" in response
-        assert len(response["source_documents"]) == 1
-        assert response["source_documents"][0].metadata["title"] == "Test Paper"
+    mock_from_llm = MagicMock()
+    monkeypatch.setattr(
+        "langchain.chains.ConversationalRetrievalChain.from_llm", mock_from_llm
+    )
+
+    # Mock the chain
+    mock_chain = MagicMock()
+    mock_chain.return_value = {
+        "answer": "This is a test analysis.",
+        "source_documents": [
+            Document(page_content="Test content", metadata={"title": "Test Paper"})
+        ],
+    }
+    mock_from_llm.return_value = mock_chain
+
+    # Initialize SyntopicalChat
+    chat = SyntopicalChat(vector_db=vector_db)
+
+    # Analyze a topic
+    response = chat.analyze_topic("quantum computing")
+
+    # Verify the response
+    assert "answer" in response
+    assert response["answer"] == "This is a test analysis."
+    assert "source_documents" in response
+    assert len(response["source_documents"]) == 1
+    assert response["source_documents"][0].metadata["title"] == "Test Paper"
 
 
 @pytest.mark.unit
 def test_reset_conversation(vector_db, mock_openai_env):
     """Test resetting the conversation history."""
-    with patch("langchain_openai.ChatOpenAI") as mock_chat_openai:
-        # Mock the ChatOpenAI class
-        mock_chat_openai.return_value = MagicMock()
-        
-        # Initialize SyntopicalChat
-        chat = SyntopicalChat(vector_db=vector_db)
-        
-        # Mock the memory
-        chat.memory = MagicMock()
-        
-        # Reset the conversation
-        chat.reset_conversation()
-        
-        # Verify the memory was cleared
-        chat.memory.clear.assert_called_once()
+    # Initialize SyntopicalChat
+    chat = SyntopicalChat(vector_db=vector_db)
+
+    # Mock the memory
+    chat.memory = MagicMock()
+
+    # Reset the conversation
+    chat.reset_conversation()
+
+    # Verify the memory was cleared
+    chat.memory.clear.assert_called_once()
 
 
 @pytest.mark.integration
-def test_end_to_end_chat(vector_db, sample_paper_content, mock_openai_env):
+def test_end_to_end_chat(
+    vector_db, sample_paper_content, mock_openai_env, stub_memory, monkeypatch
+):
     """Test end-to-end chat functionality."""
-    with patch("langchain_openai.ChatOpenAI") as mock_chat_openai, \
-         patch("langchain.chains.ConversationalRetrievalChain.from_llm") as mock_from_llm:
-        # Mock the ChatOpenAI class
-        mock_chat_openai.return_value = MagicMock()
-        
-        # Mock the chain
-        mock_chain = MagicMock()
-        mock_chain.return_value = {
-            "answer": "This is a test answer about the paper.",
-            "source_documents": [
-                Document(
-                    page_content="Test content",
-                    metadata={"title": sample_paper_content.metadata.title}
-                )
-            ]
-        }
-        mock_from_llm.return_value = mock_chain
-        
-        # Add the paper to the vector database
-        vector_db.add_paper(sample_paper_content)
-        
-        # Initialize SyntopicalChat
-        chat = SyntopicalChat(vector_db=vector_db)
-        
-        # Chat with the model
-        response = chat.chat("What is the main topic of the paper?")
-        
-        # Verify the response
-        assert "answer" in response
-        assert "This is a test answer" in response["answer"]
-        assert "source_documents" in response
-        assert len(response["source_documents"]) == 1
-        assert response["source_documents"][0].metadata["title"] == sample_paper_content.metadata.title
-        
-        # Analyze a topic
-        response = chat.analyze_topic("test topic")
-        
-        # Verify the response
-        assert "answer" in response
-        assert "This is a test answer" in response["answer"]
-        
-        # Reset the conversation
-        chat.reset_conversation()
\ No newline at end of file
+    mock_from_llm = MagicMock()
+    monkeypatch.setattr(
+        "langchain.chains.ConversationalRetrievalChain.from_llm", mock_from_llm
+    )
+
+    # Mock the chain
+    mock_chain = MagicMock()
+    mock_chain.return_value = {
+        "answer": "This is a test answer about the paper.",
+        "source_documents": [
+            Document(
+                page_content="Test content",
+                metadata={"title": sample_paper_content.metadata.title},
+            )
+        ],
+    }
+    mock_from_llm.return_value = mock_chain
+
+    # Add the paper to the vector database
+    vector_db.add_paper(sample_paper_content)
+
+    # Initialize SyntopicalChat
+    chat = SyntopicalChat(vector_db=vector_db)
+
+    # Chat with the model
+    response = chat.chat("What is the main topic of the paper?")
+
+    # Verify the response
+    assert "answer" in response
+    assert "This is a test answer" in response["answer"]
+    assert "source_documents" in response
+    assert len(response["source_documents"]) == 1
+    assert (
+        response["source_documents"][0].metadata["title"]
+        == sample_paper_content.metadata.title
+    )
+
+    # Analyze a topic
+    response = chat.analyze_topic("test topic")
+
+    # Verify the response
+    assert "answer" in response
+    assert "This is a test answer" in response["answer"]
+
+    # Reset the conversation
+    chat.reset_conversation()
+    stub_memory.clear.assert_called_once()
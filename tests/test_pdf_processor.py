@@ -1,9 +1,19 @@
 """Tests for the PDF Processor module."""
 
-import pytest
 from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
 
-from syntopicalchat.pdf_processor.processor import PDFProcessor, PaperMetadata, PaperContent
+from syntopicalchat.pdf_processor.processor import (
+    DEFAULT_TOKENIZER,
+    PaperContent,
+    PaperMetadata,
+    PDFProcessor,
+    iter_pdf_paths,
+    load_tokenizer,
+    pdf_sha256,
+)
 
 
 @pytest.mark.unit
@@ -13,11 +23,41 @@ def test_pdf_processor_initialization():
     assert processor is not None
 
 
+@pytest.mark.unit
+def test_pdf_processor_backend():
+    """Test selecting the text extraction backend."""
+    assert PDFProcessor(backend="pypdf").backend == "pypdf"
+    assert PDFProcessor().backend in ("pypdfium2", "pypdf")
+
+    with pytest.raises(ValueError):
+        PDFProcessor(backend="unknown")
+
+
+@pytest.mark.unit
+def test_text_splitter():
+    """Test that chunk sizes are measured in tokens unless no tokenizer is given."""
+    text = "Syntopical reading compares many books on one subject. " * 40
+
+    # Chunks fit the token budget of the embedding model
+    tokenizer = load_tokenizer(DEFAULT_TOKENIZER)
+    chunks = PDFProcessor(chunk_size=32, chunk_overlap=4).text_splitter.chunks(text)
+    assert len(chunks) > 1
+    assert all(
+        len(tokenizer.encode(chunk, add_special_tokens=False)) <= 32 for chunk in chunks
+    )
+
+    # Without a tokenizer, chunk sizes are measured in characters
+    chunks = PDFProcessor(
+        chunk_size=100, chunk_overlap=10, tokenizer=None
+    ).text_splitter.chunks(text)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+
+
 @pytest.mark.unit
 def test_extract_metadata(pdf_processor, sample_pdf):
     """Test extracting metadata from a PDF file."""
     metadata = pdf_processor.extract_metadata(sample_pdf)
-    
+
     assert isinstance(metadata, PaperMetadata)
     assert metadata.title == "Test Academic Paper"
     assert len(metadata.authors) > 0
@@ -29,7 +69,7 @@ def test_extract_metadata(pdf_processor, sample_pdf):
 def test_extract_text(pdf_processor, sample_pdf):
     """Test extracting text from a PDF file."""
     text = pdf_processor.extract_text(sample_pdf)
-    
+
     assert isinstance(text, str)
     assert len(text) > 0
     assert "Test Academic Paper" in text
@@ -37,55 +77,165 @@ def test_extract_text(pdf_processor, sample_pdf):
     assert "Introduction" in text
 
 
+@pytest.mark.unit
+def test_extract_text_backends_agree(sample_pdf):
+    """Test that PDFium extracts the same text as pypdf."""
+    pytest.importorskip("pypdfium2")
+
+    pdfium_text = PDFProcessor(backend="pypdfium2").extract_text(sample_pdf)
+    pypdf_text = PDFProcessor(backend="pypdf").extract_text(sample_pdf)
+
+    # Verify the fast backend finds the same content, with normalized newlines
+    assert "\r" not in pdfium_text
+    for fragment in ("Test Academic Paper", "Abstract", "Introduction"):
+        assert fragment in pdfium_text
+        assert fragment in pypdf_text
+
+
 @pytest.mark.unit
 def test_process_pdf(pdf_processor, sample_pdf):
     """Test processing a PDF file."""
     paper_content = pdf_processor.process_pdf(sample_pdf)
-    
+
     assert isinstance(paper_content, PaperContent)
     assert paper_content.metadata.title == "Test Academic Paper"
     assert len(paper_content.text) > 0
     assert "abstract" in paper_content.sections
+    assert paper_content.chunks == pdf_processor.text_splitter.chunks(
+        paper_content.text
+    )
+    assert paper_content.metadata.sha256 == pdf_sha256(sample_pdf)
+
+
+@pytest.mark.unit
+def test_iter_pdf_paths(temp_dir):
+    """Test finding the PDF files in a folder."""
+    (temp_dir / "a.pdf").write_bytes(b"%PDF-1.4 a")
+    (temp_dir / "B.PDF").write_bytes(b"%PDF-1.4 b")
+    (temp_dir / "notes.txt").write_text("not a pdf")
+    (temp_dir / "folder.pdf").mkdir()
+
+    pdf_paths = iter_pdf_paths(temp_dir)
+
+    # Verify the result is lazy and only includes PDF files
+    assert not isinstance(pdf_paths, list)
+    assert sorted(p.name for p in pdf_paths) == ["B.PDF", "a.pdf"]
 
 
 @pytest.mark.unit
-def test_extract_sections(pdf_processor, sample_pdf):
+def test_pdf_sha256(sample_pdf, sample_pdf_copy, temp_dir):
+    """Test computing the digest used to detect duplicate PDFs."""
+    other_pdf = temp_dir / "other.pdf"
+    other_pdf.write_bytes(b"%PDF-1.4 other")
+
+    digest = pdf_sha256(sample_pdf)
+    assert len(digest) == 64
+    assert pdf_sha256(sample_pdf_copy) == digest
+    assert pdf_sha256(other_pdf) != digest
+
+
+@pytest.mark.unit
+def test_extract_sections(pdf_processor, _cached_pdf_text):
     """Test extracting sections from a PDF file."""
-    # First get the text
-    text = pdf_processor.extract_text(sample_pdf)
-    
-    # Then extract sections using the private method
-    sections = pdf_processor._extract_sections(text)
-    
+    # Extract sections from the text using the private method
+    sections = pdf_processor._extract_sections(_cached_pdf_text)
+
     assert isinstance(sections, dict)
     assert "abstract" in sections
     assert len(sections["abstract"]) > 0
 
 
 @pytest.mark.unit
-def test_extract_title_from_text(pdf_processor, sample_pdf):
+def test_extract_sections_abstract_boundaries(pdf_processor):
+    """Test locating the end of the abstract in plain text."""
+    # The introduction ends the abstract even if another header comes first
+    text = "Title\nABSTRACT\nWe study 1. things.\nKeywords: x\nIntroduction\nBody"
+    sections = pdf_processor._extract_sections(text)
+    assert sections["abstract"] == "We study 1. things.\nKeywords: x"
+
+    # Without an introduction the first other header ends it; years do not
+    text = "Abstract\nResults from 2021. are shown.\nKeywords: y"
+    sections = pdf_processor._extract_sections(text)
+    assert sections["abstract"] == "Results from 2021. are shown."
+
+    # No abstract header means no abstract
+    assert pdf_processor._extract_sections("No header here") == {}
+
+
+@pytest.mark.unit
+def test_extract_sections_abstract_before_introduction(pdf_processor):
+    """Test that the abstract runs up to the introduction in any case."""
+    text = "abstract\nWe study things.\nINTRODUCTION\nBody"
+    sections = pdf_processor._extract_sections(text)
+    assert sections["abstract"] == "We study things."
+
+    # Verify the abstract is cut off when nothing ends it
+    text = "Abstract\n" + "x" * 2000
+    sections = pdf_processor._extract_sections(text)
+    assert sections["abstract"] == "x" * (1500 - len("Abstract"))
+
+
+@pytest.mark.unit
+def test_extract_title_from_text(pdf_processor, _cached_pdf_reader):
     """Test extracting title from text."""
-    # Create a reader to pass to the method
-    import pypdf
-    reader = pypdf.PdfReader(sample_pdf)
-    
     # Extract title
-    title = pdf_processor._extract_title_from_text(reader)
-    
+    title = pdf_processor._extract_title_from_text(_cached_pdf_reader)
+
     assert isinstance(title, str)
     assert len(title) > 0
     assert "Test Academic Paper" in title
 
 
+@pytest.mark.unit
+def test_extract_title_from_text_first_non_blank_line(pdf_processor):
+    """Test that the title is the first non-blank line of the first page."""
+    reader = MagicMock()
+    page = MagicMock()
+    reader.pages = [page]
+
+    page.extract_text.return_value = "\n  \n\t  A Study of Things  \nAuthor\n"
+    assert pdf_processor._extract_title_from_text(reader) == "A Study of Things"
+
+    page.extract_text.return_value = " \n\n"
+    assert pdf_processor._extract_title_from_text(reader) == ""
+
+
+@pytest.mark.unit
+def test_process_pdfs(pdf_processor, sample_pdf, sample_pdf_copy, temp_dir):
+    """Test processing several PDF files in worker processes."""
+    second_pdf = sample_pdf_copy
+    missing_pdf = temp_dir / "missing.pdf"
+
+    # Process the PDFs from a lazy iterator, with one digest already known
+    pdf_paths = iter([sample_pdf, second_pdf, missing_pdf])
+    digests = {second_pdf: "0" * 64}
+    results = list(
+        pdf_processor.process_pdfs(pdf_paths, max_workers=2, digests=digests)
+    )
+
+    # Results come back in input order, with failures reported per file
+    assert [pdf_path for pdf_path, _ in results] == [
+        sample_pdf,
+        second_pdf,
+        missing_pdf,
+    ]
+    assert all(isinstance(result, PaperContent) for _, result in results[:2])
+    assert isinstance(results[2][1], Exception)
+
+    # Verify known digests are used instead of hashing the file again
+    assert results[0][1].metadata.sha256 == pdf_sha256(sample_pdf)
+    assert results[1][1].metadata.sha256 == "0" * 64
+
+
 @pytest.mark.integration
 def test_end_to_end_pdf_processing(pdf_processor, sample_pdf):
     """Test end-to-end PDF processing."""
     # Process the PDF
     paper_content = pdf_processor.process_pdf(sample_pdf)
-    
+
     # Verify the results
     assert paper_content.metadata.title == "Test Academic Paper"
     assert len(paper_content.metadata.authors) > 0
     assert len(paper_content.text) > 0
     assert "abstract" in paper_content.sections
-    assert paper_content.metadata.source_file == sample_pdf
\ No newline at end of file
+    assert paper_content.metadata.source_file == sample_pdf
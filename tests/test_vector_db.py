@@ -1,11 +1,24 @@
 """Tests for the Vector DB Storage module."""
 
-import pytest
+import asyncio
+import sqlite3
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 
+import chromadb
+import numpy as np
+import pytest
 from langchain.schema import Document
-from syntopicalchat.vector_db.storage import VectorDBStorage
+
 from syntopicalchat.pdf_processor.processor import PaperContent
+from syntopicalchat.vector_db.storage import (
+    COLLECTION_NAME,
+    EmbeddingCache,
+    QueryCachingEmbeddings,
+    VectorDBStorage,
+    _detect_device,
+    _mean_pool_normalize,
+)
 
 
 @pytest.mark.unit
@@ -13,95 +26,566 @@ def test_vector_db_initialization(temp_dir):
     """Test that VectorDBStorage can be initialized."""
     db_path = temp_dir / "test_db"
     vector_db = VectorDBStorage(persist_directory=db_path)
-    
+
     assert vector_db is not None
     assert vector_db.persist_directory == db_path
     assert vector_db.embedding_function is not None
     assert vector_db.vector_store is not None
     assert vector_db.text_splitter is not None
 
+    # Verify the collection uses the tuned HNSW index settings
+    metadata = vector_db.vector_store._collection.metadata
+    assert metadata["hnsw:space"] == "ip"
+    assert metadata["hnsw:M"] == 24
+    assert metadata["hnsw:search_ef"] == 100
+
+
+@pytest.mark.unit
+def test_vector_db_hnsw_settings(temp_dir):
+    """Test configuring the HNSW index of a new database."""
+    vector_db = VectorDBStorage(
+        persist_directory=temp_dir / "test_db",
+        hnsw_m=32,
+        hnsw_construction_ef=200,
+        hnsw_search_ef=50,
+    )
+
+    metadata = vector_db.vector_store._collection.metadata
+    assert metadata["hnsw:M"] == 32
+    assert metadata["hnsw:construction_ef"] == 200
+    assert metadata["hnsw:search_ef"] == 50
+
+
+@pytest.mark.unit
+def test_vector_db_chroma_server(temp_dir):
+    """Test storing the embeddings on a Chroma server."""
+    with patch("chromadb.HttpClient") as mock_http_client:
+        vector_db = VectorDBStorage(
+            persist_directory=temp_dir / "test_db", chroma_host="localhost"
+        )
+
+    # Verify the vector store uses the server client
+    mock_http_client.assert_called_once_with(host="localhost", port=8000)
+    assert vector_db.vector_store._client is mock_http_client.return_value
+
+
+@pytest.mark.unit
+def test_vector_db_unknown_embedding_backend(temp_dir):
+    """Test that an unknown embedding backend is rejected."""
+    with pytest.raises(ValueError):
+        VectorDBStorage(persist_directory=temp_dir / "test_db", embedding_backend="fp8")
+
+
+@pytest.mark.unit
+def test_detect_device(monkeypatch):
+    """Test choosing the device for the embedding model."""
+    # The environment variable takes precedence
+    monkeypatch.setenv("SYNTOPICAL_DEVICE", "cpu")
+    with patch("torch.cuda.is_available", return_value=True):
+        assert _detect_device() == "cpu"
+
+    # Otherwise CUDA is preferred when available
+    monkeypatch.delenv("SYNTOPICAL_DEVICE")
+    with patch("torch.cuda.is_available", return_value=True):
+        assert _detect_device() == "cuda"
+
+    with patch("torch.cuda.is_available", return_value=False), patch(
+        "torch.backends.mps.is_available", return_value=False
+    ):
+        assert _detect_device() == "cpu"
+
+
+@pytest.mark.unit
+def test_query_caching_embeddings():
+    """Test that repeated queries are only embedded once."""
+    embeddings = MagicMock()
+    embeddings.embed_query.return_value = [0.1, 0.2, 0.3]
+    embeddings.embed_documents.return_value = [[0.1, 0.2, 0.3]]
+    caching_embeddings = QueryCachingEmbeddings(embeddings)
+
+    # Embed the same query twice and a document
+    first = caching_embeddings.embed_query("What is the main topic?")
+    first.append(1.0)
+    second = caching_embeddings.embed_query("What is the main topic?")
+    caching_embeddings.embed_documents(["Test content"])
+    caching_embeddings.embed_documents(["Test content"])
+
+    # Verify the query was embedded once and the cached value is unchanged
+    embeddings.embed_query.assert_called_once_with("What is the main topic?")
+    assert second == [0.1, 0.2, 0.3]
+    assert embeddings.embed_documents.call_count == 2
+
+
+@pytest.mark.unit
+def test_mean_pool_normalize():
+    """Test pooling ONNX token embeddings into normalized sentence embeddings."""
+    hidden_states = np.array(
+        [
+            [[2.0, 4.0], [4.0, 4.0], [100.0, 100.0]],
+            [[0.0, 2.0], [0.0, 0.0], [0.0, 0.0]],
+        ]
+    )
+    attention_mask = np.array([[1, 1, 0], [1, 0, 0]])
+
+    embeddings = _mean_pool_normalize(hidden_states, attention_mask)
+
+    # Verify padding tokens are ignored and the embeddings have unit length
+    np.testing.assert_allclose(embeddings, [[0.6, 0.8], [0.0, 1.0]])
+
 
 @pytest.mark.unit
 def test_add_paper(vector_db, sample_paper_content):
     """Test adding a paper to the vector database."""
+    sample_paper_content.chunks = ["First chunk.", "Second chunk.", "Third chunk."]
+
     # Add the paper to the database
-    ids = vector_db.add_paper(sample_paper_content)
-    
+    collection = vector_db.vector_store._collection
+    with patch.object(collection, "add", wraps=collection.add) as mock_add:
+        ids = vector_db.add_paper(sample_paper_content)
+
+    # Verify all chunks were written in a single call
+    mock_add.assert_called_once()
+    assert mock_add.call_args.kwargs["ids"] == ids
+    assert len(ids) == 3
+
     # Verify the results
     assert isinstance(ids, list)
     assert len(ids) > 0
     assert all(isinstance(id, str) for id in ids)
-    assert all(sample_paper_content.metadata.title in id for id in ids)
+    assert all(len(id) == 32 for id in ids)
+
+    # Verify adding the same paper again produces the same IDs
+    assert vector_db.add_paper(sample_paper_content) == ids
+
+    # Verify chunks only reference their paper, whose metadata is stored once
+    chunk_metadatas = vector_db.vector_store._collection.get(include=["metadatas"])[
+        "metadatas"
+    ]
+    assert all(
+        set(metadata) == {"title", "paper_id", "chunk_idx"}
+        for metadata in chunk_metadatas
+    )
+    papers = vector_db.get_all_papers()
+    assert papers[0]["authors"] == "Test Author 1, Test Author 2"
+    assert papers[0]["abstract"] == sample_paper_content.metadata.abstract
 
 
 @pytest.mark.unit
-def test_search(vector_db, sample_paper_content):
-    """Test searching for documents in the vector database."""
+def test_add_paper_with_chunks(vector_db, sample_paper_content):
+    """Test that chunks from the PDF processor are stored as-is."""
+    sample_paper_content.chunks = ["First chunk.", "Second chunk.", "Third chunk."]
+
+    # Add the paper to the database
+    ids = vector_db.add_paper(sample_paper_content)
+
+    # Verify one entry per chunk was added
+    assert len(ids) == 3
+    assert len(set(ids)) == 3
+
+    # Verify repeated chunks are only stored once
+    sample_paper_content.chunks = ["First chunk.", "Boilerplate.", "Boilerplate."]
+    sample_paper_content.metadata.title = "Another Test Paper"
+    assert len(vector_db.add_paper(sample_paper_content)) == 2
+
+
+@pytest.mark.unit
+def test_add_papers(vector_db, sample_paper_content):
+    """Test adding several papers to the vector database in one batch."""
+    second_paper = sample_paper_content.model_copy(deep=True)
+    second_paper.metadata.title = "Second Test Paper"
+
+    # Add both papers to the database
+    with patch.object(vector_db, "_embed", wraps=vector_db._embed) as mock_embed:
+        ids = vector_db.add_papers([sample_paper_content, second_paper])
+
+    # Verify the chunks of both papers were embedded in a single pass
+    mock_embed.assert_called_once()
+    assert len(mock_embed.call_args.args[0]) == len(ids)
+
+    # Verify the results
+    assert len(ids) >= 2
+    titles = {paper.get("title") for paper in vector_db.get_all_papers()}
+    assert titles == {sample_paper_content.metadata.title, "Second Test Paper"}
+
+
+@pytest.mark.unit
+def test_embedding_model_loaded_lazily(temp_dir):
+    """Test that the embedding model and its tokenizer are loaded on first use."""
+    with patch.object(
+        VectorDBStorage, "_create_embedding_function"
+    ) as mock_create, patch(
+        "syntopicalchat.vector_db.storage.get_text_splitter"
+    ) as mock_get_text_splitter:
+        mock_create.return_value.embed_query.return_value = [1.0, 0.0]
+        vector_db = VectorDBStorage(persist_directory=temp_dir / "lazy_db")
+
+        # Verify opening the database loads neither the model nor the tokenizer
+        mock_create.assert_not_called()
+        mock_get_text_splitter.assert_not_called()
+
+        # Verify the vector store loads it once on first use
+        assert vector_db.vector_store._embedding_function.embed_query("q") == [1.0, 0.0]
+        vector_db.vector_store._embedding_function.embed_query("other")
+        mock_create.assert_called_once_with("all-MiniLM-L6-v2", "fp32")
+
+
+@pytest.mark.unit
+def test_add_paper_embeds_chunks_once(vector_db, sample_paper_content):
+    """Test that the vector store does not embed the chunks a second time."""
+    embedding_function = vector_db.embedding_function
+    with patch.object(
+        embedding_function, "embed_documents", wraps=embedding_function.embed_documents
+    ) as mock_embed_documents:
+        vector_db.add_paper(sample_paper_content)
+
+    # Verify the model ran once, on the chunks embedded by add_papers
+    mock_embed_documents.assert_called_once()
+
+
+@pytest.mark.unit
+def test_add_papers_in_batches(vector_db, sample_paper_content):
+    """Test that large ingests are embedded and written batch by batch."""
+    sample_paper_content.chunks = [f"Chunk number {i}." for i in range(5)]
+
+    with patch("syntopicalchat.vector_db.storage.INGEST_BATCH_SIZE", 2), patch.object(
+        vector_db, "_embed", wraps=vector_db._embed
+    ) as mock_embed:
+        ids = vector_db.add_paper(sample_paper_content)
+
+    # Verify the chunks were embedded in three batches and all written
+    assert [len(call.args[0]) for call in mock_embed.call_args_list] == [2, 2, 1]
+    assert vector_db.vector_store._collection.count() == len(ids) == 5
+
+
+@pytest.mark.unit
+def test_add_papers_failure_leaves_no_orphans(vector_db, sample_paper_content):
+    """Test that chunks written before a failed ingest can still be deleted."""
+    sample_paper_content.chunks = [f"Chunk number {i}." for i in range(5)]
+    first_batch = vector_db._embed(sample_paper_content.chunks[:2])
+
+    # Fail while embedding the second batch
+    with patch("syntopicalchat.vector_db.storage.INGEST_BATCH_SIZE", 2), patch.object(
+        vector_db, "_embed", side_effect=[first_batch, RuntimeError("Out of memory")]
+    ):
+        with pytest.raises(RuntimeError):
+            vector_db.add_paper(sample_paper_content)
+
+    # Verify the written chunks belong to a listed paper
+    assert vector_db.vector_store._collection.count() == 2
+    assert [paper["title"] for paper in vector_db.get_all_papers()] == [
+        sample_paper_content.metadata.title
+    ]
+
+    # Verify deleting the paper removes them
+    vector_db.delete_paper(sample_paper_content.metadata.title)
+    assert vector_db.vector_store._collection.count() == 0
+
+
+@pytest.mark.unit
+def test_add_papers_streams_chunks(vector_db, sample_paper_content):
+    """Test that papers are read lazily as batches are filled."""
+    sample_paper_content.chunks = [f"Chunk number {i}." for i in range(3)]
+    consumed = []
+
+    def papers():
+        consumed.append(1)
+        yield sample_paper_content
+
+    with patch("syntopicalchat.vector_db.storage.INGEST_BATCH_SIZE", 2):
+        chunks = vector_db._iter_chunks(papers(), [])
+
+        # Verify nothing is read until the first chunk is requested
+        assert consumed == []
+        assert next(chunks)[1] == "Chunk number 0."
+        assert consumed == [1]
+
+        # Verify a generator of papers can be added
+        sample_paper_content.metadata.sha256 = "b" * 64
+        ids = vector_db.add_papers(paper for paper in [sample_paper_content])
+
+    assert len(ids) == 3
+    assert vector_db.has_document("b" * 64)
+
+
+@pytest.mark.unit
+def test_embed_sorts_by_length(vector_db):
+    """Test that chunks are embedded shortest first and returned in order."""
+    vector_db.embedding_function = MagicMock()
+    vector_db.embedding_function.embed_documents.side_effect = lambda texts: [
+        [float(len(text))] for text in texts
+    ]
+
+    embeddings = vector_db._embed(["medium", "a much longer chunk", "short"])
+
+    # Verify the model saw the chunks sorted by length
+    vector_db.embedding_function.embed_documents.assert_called_once_with(
+        ["short", "medium", "a much longer chunk"]
+    )
+
+    # Verify the embeddings are returned in the original order
+    assert embeddings == [[6.0], [19.0], [5.0]]
+
+
+@pytest.mark.unit
+def test_embed_uses_cache(vector_db):
+    """Test that chunks already embedded are taken from the embedding cache."""
+    vector_db.embedding_function = MagicMock()
+    vector_db.embedding_function.embed_documents.side_effect = lambda texts: [
+        [float(len(text)), 0.5] for text in texts
+    ]
+
+    # Repeated chunks in one batch are only embedded once
+    vector_db._embed(["first", "second", "first"])
+    vector_db.embedding_function.embed_documents.assert_called_once_with(
+        ["first", "second"]
+    )
+
+    # Cached chunks are not embedded again
+    embeddings = vector_db._embed(["second", "third"])
+    vector_db.embedding_function.embed_documents.assert_called_with(["third"])
+    assert embeddings == [[6.0, 0.5], [5.0, 0.5]]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "quantization, tolerance", [("fp32", 1e-7), ("fp16", 1e-3), ("sq8", 0.5 / 127)]
+)
+def test_embedding_cache_quantization(temp_dir, quantization, tolerance):
+    """Test storing cached embeddings at reduced precision."""
+    cache = EmbeddingCache(temp_dir / "emb_cache", "model", quantization)
+    cache.set_many(["chunk"], [[0.6, -0.8]])
+
+    # Verify the embedding round-trips within the precision of the format
+    [embedding] = cache.get_many(["chunk"])
+    assert embedding == pytest.approx([0.6, -0.8], abs=tolerance)
+
+    # Verify each format has its own entries
+    other_format = "fp16" if quantization != "fp16" else "sq8"
+    assert EmbeddingCache(temp_dir / "emb_cache", "model", other_format).get_many(
+        ["chunk"]
+    ) == [None]
+
+    with pytest.raises(ValueError):
+        EmbeddingCache(temp_dir / "emb_cache", "model", "int4")
+
+
+@pytest.mark.unit
+def test_has_document(vector_db, sample_paper_content):
+    """Test checking whether a paper is already in the database."""
+    sample_paper_content.metadata.sha256 = "a" * 64
+    assert not vector_db.has_document(sample_paper_content.metadata.sha256)
+
     # Add the paper to the database
     vector_db.add_paper(sample_paper_content)
-    
+
+    # Verify the paper is found by its digest
+    assert vector_db.has_document(sample_paper_content.metadata.sha256)
+    assert not vector_db.has_document("b" * 64)
+
+
+@pytest.mark.unit
+def test_paper_lifecycle(vector_db, sample_paper_content):
+    """Test searching, listing and deleting a paper added once."""
+    # Add the paper to the database
+    vector_db.add_paper(sample_paper_content)
+
     # Search for documents
     results = vector_db.search("test abstract")
-    
-    # Verify the results
+
+    # Verify the search results
     assert isinstance(results, list)
     assert len(results) > 0
     assert all(isinstance(doc, Document) for doc in results)
-    assert all(sample_paper_content.metadata.title in doc.metadata.get("title", "") for doc in results)
+    assert all(
+        sample_paper_content.metadata.title in doc.metadata.get("title", "")
+        for doc in results
+    )
 
+    # Verify a repeated query reuses the cached query embedding
+    with patch.object(
+        vector_db.embedding_function.embeddings, "embed_query"
+    ) as mock_embed_query:
+        assert vector_db.search("test abstract", k=1) == results[:1]
+        mock_embed_query.assert_not_called()
 
-@pytest.mark.unit
-def test_get_all_papers(vector_db, sample_paper_content):
-    """Test getting all papers from the vector database."""
-    # Add the paper to the database
-    vector_db.add_paper(sample_paper_content)
-    
     # Get all papers
     papers = vector_db.get_all_papers()
-    
-    # Verify the results
+
+    # Verify the paper is listed
     assert isinstance(papers, list)
     assert len(papers) > 0
     assert all(isinstance(paper, dict) for paper in papers)
-    assert any(sample_paper_content.metadata.title == paper.get("title", "") for paper in papers)
-
+    assert any(
+        sample_paper_content.metadata.title == paper.get("title", "")
+        for paper in papers
+    )
 
-@pytest.mark.unit
-def test_delete_paper(vector_db, sample_paper_content):
-    """Test deleting a paper from the vector database."""
-    # Add the paper to the database
-    vector_db.add_paper(sample_paper_content)
-    
-    # Verify the paper is in the database
-    papers_before = vector_db.get_all_papers()
-    assert any(sample_paper_content.metadata.title == paper.get("title", "") for paper in papers_before)
-    
     # Delete the paper
-    vector_db.delete_paper(sample_paper_content.metadata.title)
-    
+    collection = vector_db.vector_store._collection
+    ids = collection.get()["ids"]
+    with patch.object(collection, "delete", wraps=collection.delete) as mock_delete:
+        vector_db.delete_paper(sample_paper_content.metadata.title)
+
+    # Verify the chunks were deleted by ID rather than by a metadata filter
+    mock_delete.assert_called_once()
+    assert sorted(mock_delete.call_args.kwargs["ids"]) == sorted(ids)
+    assert collection.count() == 0
+
     # Verify the paper is no longer in the database
     papers_after = vector_db.get_all_papers()
-    assert not any(sample_paper_content.metadata.title == paper.get("title", "") for paper in papers_after)
+    assert not any(
+        sample_paper_content.metadata.title == paper.get("title", "")
+        for paper in papers_after
+    )
+
+
+@pytest.mark.unit
+def test_async_methods(vector_db, sample_paper_content):
+    """Test adding and searching papers from async code."""
+
+    async def add_and_search():
+        ids = await vector_db.aadd_papers([sample_paper_content])
+        results = await vector_db.asearch("test paper", k=1)
+        return ids, results
+
+    ids, results = asyncio.run(add_and_search())
+
+    # Verify the results
+    assert len(ids) > 0
+    assert len(results) == 1
+    assert results[0].metadata["title"] == sample_paper_content.metadata.title
+
+
+@pytest.mark.unit
+def test_search_filter_on_paper_metadata(vector_db, sample_paper_content):
+    """Test filtering searches on paper metadata kept in the papers table."""
+    vector_db.add_paper(sample_paper_content)
+    title = sample_paper_content.metadata.title
+
+    # Verify filters on paper metadata match the chunks of the paper
+    results = vector_db.search(
+        "test", filter_metadata={"authors": "Test Author 1, Test Author 2"}
+    )
+    assert results and all(doc.metadata["title"] == title for doc in results)
+    results = vector_db.search(
+        "test",
+        filter_metadata={
+            "$and": [{"title": title}, {"publication_date": {"$in": ["2023-01-01"]}}]
+        },
+    )
+    assert results
+
+    # Verify a filter matching no paper returns nothing
+    assert vector_db.search("test", filter_metadata={"source_file": "other.pdf"}) == []
+
+    # Verify unknown keys are rejected rather than matching nothing
+    with pytest.raises(ValueError):
+        vector_db.search("test", filter_metadata={"section": "abstract"})
+
+
+@pytest.mark.unit
+def test_get_all_papers_backfill(vector_db, sample_paper_content):
+    """Test that the papers table is filled in for a database created without it."""
+    metadata = sample_paper_content.metadata
+
+    # Store a chunk with the full paper metadata, as older versions did
+    vector_db.vector_store._collection.add(
+        ids=["legacy-chunk"],
+        embeddings=vector_db._embed(["Legacy chunk."]),
+        documents=["Legacy chunk."],
+        metadatas=[
+            {
+                "title": metadata.title,
+                "authors": ", ".join(metadata.authors),
+                "publication_date": metadata.publication_date,
+                "source_file": str(metadata.source_file),
+                "abstract": metadata.abstract,
+                "sha256": "a" * 64,
+            }
+        ],
+    )
+
+    # Reopen the database
+    with VectorDBStorage(persist_directory=vector_db.persist_directory) as reopened_db:
+        papers = reopened_db.get_all_papers()
+
+        # Verify the paper is listed with its metadata
+        assert [paper["title"] for paper in papers] == [metadata.title]
+        assert papers[0]["abstract"] == metadata.abstract
+        assert reopened_db.has_document("a" * 64)
+
+        # Verify the legacy chunk can be deleted by ID
+        reopened_db.delete_paper(metadata.title)
+        assert reopened_db.vector_store._collection.count() == 0
+
+
+@pytest.mark.unit
+def test_existing_collection_keeps_its_settings(temp_dir):
+    """Test that opening a database does not change the settings of its index."""
+    db_path = temp_dir / "l2_db"
+
+    # Create a collection with Chroma's default settings, as older versions did
+    client = chromadb.PersistentClient(path=str(db_path))
+    client.create_collection(COLLECTION_NAME).add(
+        ids=["near", "far"],
+        embeddings=[[1.0, 0.0], [3.0, 0.0]],
+        documents=["Near chunk.", "Far chunk."],
+        metadatas=[{"title": "Near Paper"}, {"title": "Far Paper"}],
+    )
+
+    # Open it and query it with the embedding of a point close to "near"
+    vector_db = VectorDBStorage(persist_directory=db_path)
+    vector_db.embedding_function = MagicMock()
+    vector_db.embedding_function.embed_query.return_value = [0.9, 0.0]
+
+    # Verify the collection is still ranked by L2 distance; by inner product
+    # the longer "far" vector would come first
+    assert not (vector_db.vector_store._collection.metadata or {}).get("hnsw:space")
+    assert [doc.metadata["title"] for doc in vector_db.search("q", k=2)] == [
+        "Near Paper",
+        "Far Paper",
+    ]
+
+
+@pytest.mark.unit
+def test_flush(vector_db, sample_paper_content):
+    """Test that the database is flushed once per batch, not per paper, and closed."""
+    with patch.object(vector_db.vector_store, "persist") as mock_persist:
+        with vector_db as db:
+            db.add_paper(sample_paper_content)
+            db.delete_paper(sample_paper_content.metadata.title)
+
+            # Verify nothing was flushed inside the batch
+            mock_persist.assert_not_called()
+
+        # Verify the database was flushed and closed on exit
+        mock_persist.assert_called_once()
+        with pytest.raises(sqlite3.ProgrammingError):
+            vector_db.papers_db.execute("SELECT 1")
 
 
 @pytest.mark.integration
+@pytest.mark.serial
 def test_end_to_end_vector_db(vector_db, sample_paper_content):
     """Test end-to-end vector database operations."""
     # Add the paper to the database
     ids = vector_db.add_paper(sample_paper_content)
     assert len(ids) > 0
-    
+
     # Search for documents
     results = vector_db.search("test abstract")
     assert len(results) > 0
-    
+
     # Get all papers
     papers = vector_db.get_all_papers()
     assert len(papers) > 0
-    
+
     # Delete the paper
     vector_db.delete_paper(sample_paper_content.metadata.title)
-    
+
     # Verify the paper is no longer in the database
     papers_after = vector_db.get_all_papers()
-    assert not any(sample_paper_content.metadata.title == paper.get("title", "") for paper in papers_after)
\ No newline at end of file
+    assert not any(
+        sample_paper_content.metadata.title == paper.get("title", "")
+        for paper in papers_after
+    )